@@ -1,15 +1,25 @@
 import traceback
-import threading, _thread, ctypes
-import time, json, os, fnmatch
+import json, os, fnmatch, re
 import argparse
-from typing import Any, Callable, Dict, List, Tuple, Union
-from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from types import CodeType
+from functools import lru_cache
+from concurrent.futures import Future
 
-from helpers.globals import *
+from helpers.globals import registry
 from helpers.utils import *
+from helpers.sandbox import SandboxPool, TimeLimitExceeded, WorkerCrashed, start_time_limit
+from helpers.telemetry import measure_performance, write_report
 
 root = "testcases"
 
+# The parsed test cases are cached (until the file is modified) so that grading the same test case again skips the parsing
+# The returned dictionary is shared between the callers, so it must not be modified
+@memoize_by_file
+def load_test_case(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        return json.load(f)
+
 def get_test_cases(path: str, pattern: str) -> List[Dict[str, Any]]:
     test_cases = []
     for filename in os.listdir(path):
@@ -17,48 +27,54 @@ def get_test_cases(path: str, pattern: str) -> List[Dict[str, Any]]:
         if not fnmatch.fnmatchcase(filename, pattern): continue
         filepath = os.path.join(path, filename)
         if os.path.isfile(filepath) and os.path.splitext(filepath)[1] == ".json":
-            test_cases.append(json.load(open(filepath, 'r')))
+            test_cases.append(load_test_case(filepath))
     return test_cases
 
+# The expressions in the test cases are compiled once, then every evaluation reuses the compiled code
+@lru_cache(maxsize=None)
+def compile_expression(expression: str) -> CodeType:
+    return compile(expression, "<testcase>", "eval")
+
+# The names used by the expression are imported from the registry right before it is evaluated
+def evaluate_expression(expression: str) -> Any:
+    code = compile_expression(expression)
+    registry.resolve(code, globals())
+    return eval(code)
+
+# Matches the quoted function paths in the expressions (e.g. 'search.AStarSearch') to find the modules that the tests will load
+module_reference = re.compile(r"""["']([A-Za-z_]\w*)\.[A-Za-z_]\w*["']""")
+
 def read_problems() -> Tuple[str, List[Dict[Any, str]]]:
     data = json.load(open(os.path.join(root, "problems.json")))
     return data.get("name", ""), data.get("problems", [])
 
-def raise_exception_in_thread(thread: threading.Thread, exception: Exception):
-    tid = thread.ident
-    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(tid), ctypes.py_object(exception))
-
-def run_test(fn: Callable, input_args: Arguments, cmp: Callable, cmp_args: Arguments, timeout: 10) -> Union[Result, None]:
-    def _call(queue: Queue):
-        try:
-            output = fn(*input_args.args, **input_args.kwargs)
-            result = cmp(output, *cmp_args.args, **cmp_args.kwargs)
-        except NotImplementedError as err:
-            result = None
-        except:
-            result = Result(False, 0, traceback.format_exc())
-        queue.put(result)
-    queue = Queue()
-    thread = threading.Thread(target=_call, args=(queue,), daemon=True)
-    thread.start()
-    start = time.time()
+# Runs the test in the current thread. The time limit is not enforced here;
+# it is enforced by the sandbox which kills the worker process running the test if it takes too long
+# The performance of the function (not the comparator) is measured and stored in the metrics of the result
+def run_test(fn: Callable, input_args: Arguments, cmp: Callable, cmp_args: Arguments) -> Union[Result, None]:
+    metrics = {}
     try:
-        thread.join(timeout)
+        with measure_performance() as metrics:
+            output = fn(*input_args.args, **input_args.kwargs)
+        result = cmp(output, *cmp_args.args, **cmp_args.kwargs)
+    except NotImplementedError as err:
+        result = None
     except KeyboardInterrupt:
-        raise_exception_in_thread(thread, KeyboardInterrupt())
         raise
-    elapsed = time.time() - start
-    if queue.empty():
-        if elapsed >= timeout:
-            result = Result(False, 0, "Timeout")
-        else:
-            result = Result(False, 0, "Run Failed")
-    else:
-        result = queue.get()
-    raise_exception_in_thread(thread, KeyboardInterrupt())
-    del thread
+    except:
+        result = Result(False, 0, traceback.format_exc())
+    if result is not None: result.metrics = metrics
     return result
 
+# Waits for the result of a test that was submitted to the sandbox
+def collect_result(future: Future) -> Union[Result, None]:
+    try:
+        return future.result()
+    except TimeLimitExceeded:
+        return Result(False, 0, "Timeout")
+    except WorkerCrashed:
+        return Result(False, 0, "Run Failed")
+
 def default_comparator(output, expected):
     success = output == expected
     grade = (1 if success else 0)
@@ -79,48 +95,103 @@ def approximate_comparator(output, expected):
 
 class Problem:
     def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
         self.name = kwargs.get("name", "Unnamed Problem")
         self.testcases_path = kwargs.get("testcases_path", self.name)
         self.default_fn = lambda x: x
-        if "function" in kwargs: self.default_fn = eval(kwargs["function"])
+        if "function" in kwargs: self.default_fn = evaluate_expression(kwargs["function"])
         self.default_cmp = default_comparator
-        if "comparator" in kwargs: self.default_cmp = eval(kwargs["comparator"])
+        if "comparator" in kwargs: self.default_cmp = evaluate_expression(kwargs["comparator"])
         self.weight = kwargs.get("weight", 1)
         self.default_timeout = kwargs.get("timeout", 1)
         self.grade = 0
         self.maximum_grade = 0
+        # The telemetry of every test case in the last run
+        self.records: List[Dict[str, Any]] = []
     
-    def run(self, is_debug: bool = False, pattern: str = "*", time_scale: float = 1):
+    def get_test_cases(self, pattern: str = "*") -> List[Dict[str, Any]]:
+        return get_test_cases(os.path.join(root, self.testcases_path), pattern)
+
+    def get_timeout(self, test_case: Dict[str, Any]) -> float:
+        return test_case.get("timeout", self.default_timeout)
+
+    def get_maximum_grade(self, test_case: Dict[str, Any]) -> float:
+        return self.weight * test_case.get("weight", 1) * test_case.get("maximum_grade", 1)
+
+    def get_grade(self, test_case: Dict[str, Any], result: Union[Result, None]) -> float:
+        return 0 if result is None else self.weight * test_case.get("weight", 1) * result.grade
+
+    # Returns the names of the modules referred to by the problem and its test cases (the modules may not exist)
+    def get_module_names(self, pattern: str = "*") -> Set[str]:
+        expressions = [self.kwargs.get("function", "")]
+        for test_case in self.get_test_cases(pattern):
+            expressions.append(test_case.get("function", ""))
+            expressions += test_case.get("input_args", [])
+            expressions += test_case.get("input_kwargs", {}).values()
+        return {name for expression in expressions for name in module_reference.findall(expression)}
+
+    # Evaluates the test case definition into the function, comparator and their arguments
+    def decode(self, test_case: Dict[str, Any]) -> Tuple[Callable, Arguments, Callable, Arguments]:
+        fn = self.default_fn
+        if "function" in test_case: fn = evaluate_expression(test_case["function"])
+        fn_args = Arguments(
+            [evaluate_expression(arg) for arg in test_case.get("input_args", [])],
+            {key:evaluate_expression(value) for key, value in test_case.get("input_kwargs", {}).items()})
+        cmp = self.default_cmp
+        if "comparator" in test_case: cmp = evaluate_expression(test_case["comparator"])
+        cmp_args = Arguments(
+            [evaluate_expression(arg) for arg in test_case.get("comparison_args", [])],
+            {key:evaluate_expression(value) for key, value in test_case.get("comparison_kwargs", {}).items()})
+        return fn, fn_args, cmp, cmp_args
+
+    def evaluate(self, test_case: Dict[str, Any]) -> Union[Result, None]:
+        fn, fn_args, cmp, cmp_args = self.decode(test_case)
+        # Loading the inputs is not counted in the time limit
+        start_time_limit()
+        return run_test(fn, fn_args, cmp, cmp_args)
+
+    # Sends every test case to the sandbox so that they run in parallel with the test cases of other problems
+    # The returned futures are in the same order as the test cases, so the report stays deterministic
+    def submit(self, pool: SandboxPool, pattern: str = "*", time_scale: float = 1) -> List[Future]:
+        return [
+            pool.submit(execute_test_case, self.kwargs, test_case, timeout=self.get_timeout(test_case) * time_scale)
+            for test_case in self.get_test_cases(pattern)
+        ]
+    
+    def run(self, is_debug: bool = False, pattern: str = "*", time_scale: float = 1, pending: Optional[List[Future]] = None):
         print(f"Problem: {self.name}")
-        test_cases = get_test_cases(os.path.join(root, self.testcases_path), pattern)
+        test_cases = self.get_test_cases(pattern)
         self.grade = 0
         self.maximum_grade = 0
+        self.records = []
         for test_index, test_case in enumerate(test_cases):
             description = test_case.get("description", f"Test Case {test_index+1}")
-            timeout = test_case.get("timeout", self.default_timeout)
+            timeout = self.get_timeout(test_case)
             if is_debug:
                 print(f"{test_index+1}: {description} :: time-limit is turned off in debug mode")
             else:
                 print(f"{test_index+1}: {description} :: time-limit = {timeout*time_scale} sec")
-            fn = self.default_fn
-            if "function" in test_case: fn = eval(test_case["function"])
             input_args = test_case.get("input_args", [])
             input_kwargs = test_case.get("input_kwargs", {})
-            fn_args = Arguments(
-                [eval(arg) for arg in input_args], {key:eval(value) for key, value in input_kwargs.items()})
-            cmp = self.default_cmp
-            if "comparator" in test_case: cmp = eval(test_case["comparator"])
-            cmp_args = Arguments(
-                [eval(arg) for arg in test_case.get("comparison_args", [])],
-                {key:eval(value) for key, value in test_case.get("comparison_kwargs", {}).items()})
-            weight = test_case.get("weight", 1)
-            maximum_grade = self.weight * weight * test_case.get("maximum_grade", 1)
+            maximum_grade = self.get_maximum_grade(test_case)
             self.maximum_grade += maximum_grade
-            result = run_test(fn, fn_args, cmp, cmp_args, (None if is_debug else timeout * time_scale))
+            if pending is None:
+                result = self.evaluate(test_case)
+            else:
+                result = collect_result(pending[test_index])
+            self.records.append({
+                "problem": self.name,
+                "test": test_index+1,
+                "description": description,
+                "status": "not implemented" if result is None else ("pass" if result.success else "fail"),
+                "grade": self.get_grade(test_case, result),
+                "maximum_grade": maximum_grade,
+                **({} if result is None else result.metrics)
+            })
             if result is None:
                 print("Function is not implemented yet")
                 continue
-            grade = self.weight * weight * result.grade
+            grade = self.get_grade(test_case, result)
             if result.success:
                 print(f"Result: PASS {grade}/{maximum_grade}", end="")
                 if result.message:
@@ -139,6 +210,34 @@ class Problem:
             self.grade += grade
         print(f"Total {self.grade}/{self.maximum_grade}")
 
+# Prepares a sandbox worker to run the tests.
+# The solution modules are executed once per worker (see load_solution_module), so all the tests that a worker runs
+# share the same module objects: the global variables, memo dictionaries and caches set by a test are seen by the next ones.
+def initialize_worker(solution_path: str, trace_memory: bool = False, modules: Tuple[str, ...] = ()):
+    set_solution_path(solution_path)
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    preload_solution_modules(modules)
+
+# The run of the last test executed by this worker (see execute_test_case)
+current_run: Any = None
+
+# This is the entry point of the sandbox workers
+# The problem is rebuilt from its definition since only plain data can be sent to the worker
+# If a solution path is given, it replaces the one set for the worker (used to grade many students with the same workers)
+# If a run is given (any value that identifies a grading run) and it is not the run of the previous test of this worker,
+# the solution modules are executed again before the test, so the state of the modules is only shared within a run.
+def execute_test_case(problem_kwargs: Dict[str, Any], test_case: Dict[str, Any], solution_path: Optional[str] = None,
+                      run: Any = None) -> Union[Result, None]:
+    global current_run
+    if run is not None and run != current_run:
+        # The modules preloaded by a new worker were never used, so they are kept for its first run
+        if current_run is not None: invalidate_module_cache()
+        current_run = run
+    if solution_path is not None: set_solution_path(solution_path)
+    return Problem(**problem_kwargs).evaluate(test_case)
+
 def main(args: argparse.Namespace):
     time_scale = args.timescale
     if time_scale.lower() == "default":
@@ -147,9 +246,11 @@ def main(args: argparse.Namespace):
     else:
         time_scale = float(time_scale)
 
+    if INSTRUMENTATION != "full":
+        print(f"{bcolors.YELLOW}Warning: The instrumentation is set to \"{INSTRUMENTATION}\", so the tests that check the explored nodes may fail.{bcolors.ENDC}")
+
     name, problems = read_problems()
-    set_solution_path(args.solution)
-    problems = [Problem(**problem) for problem in problems]
+    initialize_worker(args.solution, args.trace_memory and args.debug)
     print(f"\n{name}\n")
     total_grade = 0
     maximum_grade = 0
@@ -173,11 +274,32 @@ def main(args: argparse.Namespace):
             pass
     else:
         problems = [(problem, "*") for index, problem in enumerate(problems)]
-    for problem, pattern in problems:
-        problem.run(args.debug, pattern, time_scale)
-        print()
-        total_grade += problem.grade
-        maximum_grade += problem.maximum_grade
+    # Only the selected problems are built, so the modules of the other problems are never imported
+    problems = [(Problem(**problem), pattern) for problem, pattern in problems]
+    # The solution modules used by the selected tests are loaded once by each worker instead of once by each test
+    modules = tuple(sorted(set().union(*(problem.get_module_names(pattern) for problem, pattern in problems))))
+    if not args.debug:
+        # The time limits are measured in wall-clock time, so we never run more jobs than there are cores
+        jobs = min(args.jobs if args.jobs > 0 else os.cpu_count(), os.cpu_count())
+        # The workers need the solution path too since they load the solution modules by themselves
+        with SandboxPool(jobs, initializer=initialize_worker, initargs=(args.solution, args.trace_memory, modules)) as pool:
+            # Submit everything before reporting anything so that the problems run in parallel too 
+            pending = [problem.submit(pool, pattern, time_scale) for problem, pattern in problems]
+            for (problem, pattern), futures in zip(problems, pending):
+                problem.run(args.debug, pattern, time_scale, futures)
+                print()
+                total_grade += problem.grade
+                maximum_grade += problem.maximum_grade
+    else:
+        # In debug mode, the tests run in this process so that a debugger can step into them
+        preload_solution_modules(modules)
+        for problem, pattern in problems:
+            problem.run(args.debug, pattern, time_scale)
+            print()
+            total_grade += problem.grade
+            maximum_grade += problem.maximum_grade
+    if args.report:
+        write_report(args.report, [record for problem, _ in problems for record in problem.records])
     print(f"Problem Set Total {total_grade}/{maximum_grade}\n")
     exit(total_grade)
 
@@ -187,5 +309,8 @@ if __name__ == "__main__":
     parser.add_argument("--debug", "-d", action="store_true", help="Disables timeout to enable debugging via the autograder")
     parser.add_argument("--timescale", "-t", type=str, default="default", help="A scaling factor for the timeout")
     parser.add_argument("--solution", "-s", default="")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="the number of worker processes used to run the testcases in parallel (0 to use all the cores). It is capped by the number of cores and ignored in debug mode")
+    parser.add_argument("--report", "-r", default="", help="write the performance telemetry of every testcase to this file (csv if the file extension is .csv, otherwise json)")
+    parser.add_argument("--trace-memory", action="store_true", help="measure the peak memory allocated by python in each testcase using tracemalloc (slows the tests down)")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, List, Optional, Tuple
 from problem import HeuristicFunction, Problem, S, A, Solution
 
 # This is an abstract class for all goal based agents
@@ -22,14 +23,18 @@ class HumanAgent(GoalBasedAgent[S, A]):
         return self.user_input_fn(problem, state)
 
 # This agent applies an uninformed search algorithm to find the solution to goal for the given state
+# If a solution cache is given, it replaces the policy and keeps the results of all the previous searches (see SolutionCache)
 class UninformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution]) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution], solution_cache: Optional['SolutionCache[S, A]'] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
+        self.solution_cache = solution_cache
     
     def act(self, problem: Problem[S, A], state: S) -> A:
+        if self.solution_cache is not None:
+            return self.solution_cache.act(problem, state, self.search_fn)
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
             solution = self.search_fn(problem, state)
@@ -45,15 +50,25 @@ class UninformedSearchAgent(GoalBasedAgent[S, A]):
         return self.policy.get(state)
 
 # This agent applies an informed search algorithm to find the solution to goal for the given state
+# If a solution cache is given, it replaces the policy and the searches also use the costs it learned as a heuristic.
+# If the cache is optimal, the searches also stop as soon as they reach a state that is already solved (see SolutionCache)
 class InformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction,
+                 solution_cache: Optional['SolutionCache[S, A]'] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         self.heuristic = heuristic
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
+        self.solution_cache = solution_cache
     
     def act(self, problem: Problem[S, A], state: S) -> A:
+        if self.solution_cache is not None:
+            heuristic = self.solution_cache.improve(self.heuristic)
+            search_fn = lambda problem, state: self.search_fn(problem, state, heuristic)
+            # The other searches (e.g. ARA* and the beam search) would score a solved state by its cost from the start
+            # without the rest of its path, so they could prefer it to a cheaper goal
+            return self.solution_cache.act(problem, state, search_fn, stop_at_solved=self.solution_cache.optimal)
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
             solution = self.search_fn(problem, state, self.heuristic)
@@ -66,4 +81,141 @@ class InformedSearchAgent(GoalBasedAgent[S, A]):
             for action in solution:
                 self.policy[current] = action
                 current = problem.get_successor(current, action)
-        return self.policy.get(state)
\ No newline at end of file
+        return self.policy.get(state)
+
+# A cache of the results of all the previous searches of an agent, which lets it act without searching again
+# when it is moved off its path (e.g. by a human correction) to a state it already knows about.
+# For each state, it stores a cost to the goal, the action to take (None if unknown) and whether the state is solved:
+#   - The states on the found paths are solved: their action is the next action of the path
+#     and their cost is the cost of the rest of the path (the cost to the goal if the search is optimal).
+#   - If the searches are complete, the states closed by a search that found no solution are solved with an infinite cost
+#     (none of them can reach the goal).
+#   - If the searches are optimal, every state closed by a search that found a path with cost C gets the lower bound C - g(s),
+#     where g(s) is the cost with which the search reached it, since no path through the state costs less than C (Adaptive A*).
+# The costs of the states are used as a heuristic by the later searches (taking the maximum with the agent heuristic), and
+# if the searches are optimal, an informed search stops at the first solved state that it selects, which is still optimal
+# since the heuristic of that state is its exact cost to the goal.
+# The cache holds at most 'max_size' states and evicts the least recently used ones. Evicting a state lowers its heuristic
+# back to the agent heuristic, which can make the heuristic inconsistent (but it stays admissible).
+# The closed states and their costs are recorded by wrapping problem.expand during the search,
+# so they are only known for the searches that expand the given problem (e.g. not the push-level searches of sokoban).
+class SolutionCache(Generic[S, A]):
+    # 'optimal' should only be True if the searches return the cheapest paths (e.g. UCS, A* with a consistent heuristic, IDA*)
+    # 'complete' should only be True if the searches only return None when no path exists
+    # (not e.g. the beam search, which can prune every path, or the anytime searches, which can run out of time)
+    def __init__(self, max_size: int = 2**16, optimal: bool = True, complete: bool = True) -> None:
+        self.max_size = max_size
+        self.optimal = optimal
+        self.complete = complete
+        # state -> (cost to the goal or a lower bound on it, action to take, whether the state is solved)
+        self.entries: OrderedDict[S, Tuple[float, Optional[A], bool]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, state: S) -> bool:
+        return state in self.entries
+
+    # Returns the entry of the state (or None) and marks it as the most recently used
+    def get(self, state: S) -> Optional[Tuple[float, Optional[A], bool]]:
+        entry = self.entries.get(state)
+        if entry is not None: self.entries.move_to_end(state)
+        return entry
+
+    def is_solved(self, state: S) -> bool:
+        entry = self.get(state)
+        return entry is not None and entry[2]
+
+    # Returns whether the state is solved and the goal can be reached from it
+    def has_path(self, state: S) -> bool:
+        entry = self.get(state)
+        return entry is not None and entry[2] and entry[0] != float("inf")
+
+    # Returns a lower bound on the cost from the state to the goal (0 if nothing is known about it).
+    # It is called for every state evaluated by the searches, so it does not mark the state as recently used.
+    def lower_bound(self, state: S) -> float:
+        entry = self.entries.get(state)
+        if entry is None: return 0
+        cost = entry[0]
+        # The costs of the paths found by searches that are not optimal are not lower bounds (unless there is no path)
+        return cost if self.optimal or cost == float("inf") else 0
+
+    # Stores the result for a state. A solved state keeps its entry when it is only given a lower bound,
+    # and a state keeps the highest of its lower bounds.
+    def store(self, state: S, cost: float, action: Optional[A], solved: bool):
+        entry = self.entries.get(state)
+        if entry is not None and not solved:
+            if entry[2]: cost, action, solved = entry
+            else: cost = max(cost, entry[0])
+        self.entries[state] = (cost, action, solved)
+        self.entries.move_to_end(state)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    # Returns a heuristic which is the maximum of the given heuristic and the lower bounds of the cache
+    def improve(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def improved(problem: Problem[S, A], state: S) -> float:
+            return max(heuristic(problem, state), self.lower_bound(state))
+        return improved
+
+    # Returns the action to take in the state, running search_fn(problem, state) if the state is not solved yet
+    def act(self, problem: Problem[S, A], state: S, search_fn: Callable[[Problem[S, A], S], Solution], stop_at_solved: bool = False) -> Optional[A]:
+        entry = self.get(state)
+        if entry is not None and entry[2]:
+            return entry[1]
+        solution = self.search(problem, state, search_fn, stop_at_solved)
+        return solution[0] if solution else None
+
+    # Runs the search from the state and stores its results in the cache.
+    # If 'stop_at_solved' is True, the solved states that can reach the goal are treated as goals, so the returned path may end at one of them.
+    # This is meant for the searches that use the cached costs as their heuristic, so the lower bounds are only computed in this case.
+    def search(self, problem: Problem[S, A], state: S, search_fn: Callable[[Problem[S, A], S], Solution], stop_at_solved: bool = False) -> Solution:
+        inf = float("inf")
+        record_bounds = stop_at_solved and self.optimal
+        costs: Dict[S, float] = {state: 0} # The lowest cost found to each generated state (only if the bounds are recorded)
+        closed: List[S] = [] # The expanded states in the order of expansion
+        expand, is_goal = problem.expand, problem.is_goal
+        def recording_expand(node: S):
+            expansions = expand(node)
+            closed.append(node)
+            if record_bounds:
+                cost = costs.get(node, inf)
+                for _, child, action_cost in expansions:
+                    if cost + action_cost < costs.get(child, inf):
+                        costs[child] = cost + action_cost
+            return expansions
+        # The methods are replaced on the problem object only, and restored after the search
+        patched = vars(problem)
+        previous = {name: patched[name] for name in ("expand", "is_goal") if name in patched}
+        problem.expand = recording_expand
+        if stop_at_solved:
+            problem.is_goal = lambda node: is_goal(node) or self.has_path(node)
+        try:
+            solution = search_fn(problem, state)
+        finally:
+            for name in ("expand", "is_goal"):
+                if name in previous: patched[name] = previous[name]
+                else: patched.pop(name, None)
+        if solution is None:
+            # If the search gave up without exploring everything, nothing is learned
+            if self.complete:
+                for node in closed: self.store(node, inf, None, True)
+                self.store(state, inf, None, True)
+            return None
+        # Follow the path to find the cost of reaching each of its states
+        path, path_costs = [state], [0]
+        for action in solution:
+            path_costs.append(path_costs[-1] + problem.get_cost(path[-1], action))
+            path.append(problem.get_successor(path[-1], action))
+        end = path[-1]
+        reached_goal = problem.is_goal(end)
+        # If the path stopped at a solved state, the rest of the path is in the cache
+        end_entry = (0, None, True) if reached_goal else self.entries[end]
+        total = path_costs[-1] + end_entry[0]
+        if record_bounds:
+            for node in closed: self.store(node, total - costs[node], None, False)
+        # The states on the path are stored last so they are the last to be evicted
+        self.store(end, *end_entry)
+        for node, cost, action in reversed(list(zip(path, path_costs, solution))):
+            self.store(node, total - cost, action, True)
+        return solution
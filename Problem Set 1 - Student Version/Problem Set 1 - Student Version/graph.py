@@ -1,10 +1,10 @@
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 import json
 
 from problem import Problem
 from mathutils import Point, euclidean_distance
-from helpers.utils import record_calls
+from helpers.utils import memoize_by_file, record_calls
 
 # In the graph routing problem, the state is a graph node
 # We use dataclass with frozen=True to automatically implement:
@@ -21,11 +21,14 @@ class GraphNode:
 
 # This is the implementation of the graph routing problem
 class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
-    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]]) -> None:
+    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]],
+                 reverse_adjacency: Optional[Dict[GraphNode, List[GraphNode]]] = None) -> None:
         super().__init__()
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        # For each node, the nodes from which it can be reached (used to search backward from the goal)
+        self.reverse_adjacency = reverse_adjacency if reverse_adjacency is not None else reverse_graph(adjacency)
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -43,12 +46,31 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     def get_successor(self, state: GraphNode, action: GraphNode) -> GraphNode:
         return action
     
+    # Returns the (predecessor, action) pairs from which the given state can be reached in one step
+    def get_predecessors(self, state: GraphNode) -> Iterable[Tuple[GraphNode, GraphNode]]:
+        return [(predecessor, state) for predecessor in self.reverse_adjacency.get(state, [])]
+    
     # The cost of an action is the distance between the current node and the next node 
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
         return euclidean_distance(state.position, action.position)
     
+    # Returns the (action, next state, cost) of every edge leaving the node in the order of get_actions.
+    # The graph is never modified, so the edges of each node are computed once and stored in the cache
+    # (get_actions is still called to record the traversal order). The returned list is shared so it must not be modified.
+    def expand(self, state: GraphNode) -> List[Tuple[GraphNode, GraphNode, float]]:
+        actions = self.get_actions(state)
+        expansions = self.cache().get("expansions")
+        if expansions is None:
+            expansions = self.cache()["expansions"] = {}
+        edges = expansions.get(state)
+        if edges is None:
+            edges = expansions[state] = [(action, action, euclidean_distance(state.position, action.position)) for action in actions]
+        return edges
+    
     # Read a graph routing problem from file
+    # The problem is memoized by path (until the file is modified) since it is never modified after loading
     @staticmethod
+    @memoize_by_file
     def from_file(path: str) -> 'GraphRoutingProblem':
         problem_def: Dict[str, Dict] = json.load(open(path, 'r'))
         graph_def: Dict[str, Dict] = problem_def.get("graph", {})
@@ -60,7 +82,15 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
             adjacency[node] = adjacent
         start = node_dict[problem_def.get("start", "")]
         goal = node_dict[problem_def.get("goal", "")]
-        return GraphRoutingProblem(start, goal, adjacency)
+        return GraphRoutingProblem(start, goal, adjacency, reverse_graph(adjacency))
+
+# Returns the adjacency of the graph with every edge reversed
+def reverse_graph(adjacency: Dict[GraphNode, List[GraphNode]]) -> Dict[GraphNode, List[GraphNode]]:
+    reverse: Dict[GraphNode, List[GraphNode]] = {node: [] for node in adjacency}
+    for node, adjacent in adjacency.items():
+        for neighbor in adjacent:
+            reverse.setdefault(neighbor, []).append(node)
+    return reverse
 
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
     return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
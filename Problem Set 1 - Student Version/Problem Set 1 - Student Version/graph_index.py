@@ -0,0 +1,324 @@
+from typing import Dict, List, Optional, Tuple
+import argparse, hashlib, heapq, json, os
+
+from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
+from mathutils import euclidean_distance
+from problem import Solution
+
+# This file contains a preprocessing step for the graph routing problem.
+# The index is computed once per graph and saved next to the graph file ("graph1.json" -> "graph1.index.json")
+# so that the routing queries on the same graph can reuse it. It contains:
+#   1. The landmark distance tables (ALT): the distances from and to a few landmark nodes.
+#      By the triangle inequality, d(s, t) >= d(L, t) - d(L, s) and d(s, t) >= d(s, L) - d(t, L) for every landmark L,
+#      so the largest of these bounds is an admissible and consistent heuristic (see landmark_heuristic).
+#   2. Optionally, a contraction hierarchy: the nodes are ranked and contracted one by one,
+#      and shortcut edges are added to preserve the shortest paths between the remaining nodes.
+#      A query then only follows the edges going up in the ranking (see ContractionHierarchySearch).
+
+Adjacency = Dict[GraphNode, List[GraphNode]]
+
+# The cost of an edge between two nodes (the same as GraphRoutingProblem.get_cost)
+def edge_cost(node: GraphNode, neighbor: GraphNode) -> float:
+    return euclidean_distance(node.position, neighbor.position)
+
+# Returns the path cost from the source to every node reachable from it following the given adjacency
+# (use the reverse adjacency to get the path cost from every node to the source)
+def dijkstra_distances(adjacency: Adjacency, source: GraphNode) -> Dict[GraphNode, float]:
+    distances = {source: 0}
+    done = set()
+    heap = [(0, 0, source)]
+    order = 1 # ties are broken by the insertion order since the nodes are not comparable
+    while heap:
+        distance, _, node = heapq.heappop(heap)
+        if node in done: continue
+        done.add(node)
+        for neighbor in adjacency.get(node, []):
+            new_distance = distance + edge_cost(node, neighbor)
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, order, neighbor))
+                order += 1
+    return distances
+
+# Picks the landmarks by farthest point selection: each landmark is the node that is the farthest
+# (in the sum of the forward and backward path costs) from the closest of the landmarks picked before it.
+# Landmarks on the border of the graph give the tightest bounds for the nodes behind them.
+# Returns the landmarks with their distance tables (from the landmark, to the landmark).
+def select_landmarks(problem: GraphRoutingProblem, count: int) -> List[Tuple[GraphNode, Dict[GraphNode, float], Dict[GraphNode, float]]]:
+    nodes = sorted(problem.adjacency, key=lambda node: node.name)
+    if not nodes or count <= 0: return []
+    # The first landmark is the farthest node from an arbitrary node
+    seed_forward = dijkstra_distances(problem.adjacency, nodes[0])
+    seed_backward = dijkstra_distances(problem.reverse_adjacency, nodes[0])
+    separation = {node: seed_forward.get(node, 0) + seed_backward.get(node, 0) for node in nodes}
+    landmarks = []
+    while len(landmarks) < min(count, len(nodes)):
+        chosen = {landmark for landmark, _, _ in landmarks}
+        landmark = max((node for node in nodes if node not in chosen), key=lambda node: separation[node])
+        forward = dijkstra_distances(problem.adjacency, landmark)
+        backward = dijkstra_distances(problem.reverse_adjacency, landmark)
+        landmarks.append((landmark, forward, backward))
+        for node in nodes:
+            distance = forward.get(node, 0) + backward.get(node, 0)
+            separation[node] = distance if not chosen else min(separation[node], distance)
+    return landmarks
+
+# A contraction hierarchy over the graph.
+# 'rank' is the order in which the nodes were contracted and 'shortcuts' maps each shortcut edge (u, w) to the
+# contracted node in the middle of it, so the shortest paths can be unpacked back into the original edges.
+class ContractionHierarchy:
+    def __init__(self, problem: GraphRoutingProblem, order: List[GraphNode], shortcuts: Dict[Tuple[GraphNode, GraphNode], Tuple[GraphNode, float]]) -> None:
+        self.rank = {node: index for index, node in enumerate(order)}
+        self.shortcuts = shortcuts
+        # upward[u] are the edges u -> w with rank(w) > rank(u), and downward[w] are the edges u -> w with rank(u) > rank(w)
+        self.upward: Dict[GraphNode, List[Tuple[GraphNode, float]]] = {node: [] for node in order}
+        self.downward: Dict[GraphNode, List[Tuple[GraphNode, float]]] = {node: [] for node in order}
+        edges = {(node, neighbor): edge_cost(node, neighbor) for node, adjacent in problem.adjacency.items() for neighbor in adjacent}
+        edges.update({edge: cost for edge, (_, cost) in shortcuts.items()})
+        for (node, neighbor), cost in edges.items():
+            if self.rank[neighbor] > self.rank[node]:
+                self.upward[node].append((neighbor, cost))
+            else:
+                self.downward[neighbor].append((node, cost))
+
+    # Contracts the nodes from the least to the most important, where the importance of a node is its edge difference
+    # (the shortcuts needed to remove it minus the edges it removes) plus the number of its contracted neighbors.
+    # The importance is updated lazily: a node is only contracted if it is still the least important after recomputing it.
+    @staticmethod
+    def build(problem: GraphRoutingProblem, witness_limit: int = 64) -> 'ContractionHierarchy':
+        outgoing = {node: {neighbor: edge_cost(node, neighbor) for neighbor in adjacent if neighbor != node} for node, adjacent in problem.adjacency.items()}
+        incoming: Dict[GraphNode, Dict[GraphNode, float]] = {node: {} for node in outgoing}
+        for node, adjacent in outgoing.items():
+            for neighbor, cost in adjacent.items():
+                incoming[neighbor][node] = cost
+        contracted_neighbors = {node: 0 for node in outgoing}
+        shortcuts: Dict[Tuple[GraphNode, GraphNode], Tuple[GraphNode, float]] = {}
+
+        # Returns the shortcuts needed to contract the node: for each pair u -> node -> w,
+        # a shortcut is needed unless a witness path from u to w that avoids the node is at most as cheap
+        def needed_shortcuts(node: GraphNode) -> List[Tuple[GraphNode, GraphNode, float]]:
+            needed = []
+            for source, in_cost in incoming[node].items():
+                targets = {target: in_cost + out_cost for target, out_cost in outgoing[node].items() if target != source}
+                if not targets: continue
+                witness = _witness_search(outgoing, source, node, max(targets.values()), witness_limit)
+                for target, cost in targets.items():
+                    if witness.get(target, float("inf")) > cost:
+                        needed.append((source, target, cost))
+            return needed
+
+        def importance(node: GraphNode) -> int:
+            return len(needed_shortcuts(node)) - len(incoming[node]) - len(outgoing[node]) + contracted_neighbors[node]
+
+        nodes = sorted(outgoing, key=lambda node: node.name)
+        heap = [(importance(node), index, node) for index, node in enumerate(nodes)]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, index, node = heapq.heappop(heap)
+            current = importance(node)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, index, node))
+                continue
+            for source, target, cost in needed_shortcuts(node):
+                if cost < outgoing[source].get(target, float("inf")):
+                    outgoing[source][target] = incoming[target][source] = cost
+                    shortcuts[(source, target)] = (node, cost)
+            for neighbor in set(incoming[node]) | set(outgoing[node]):
+                contracted_neighbors[neighbor] += 1
+                outgoing[neighbor].pop(node, None)
+                incoming[neighbor].pop(node, None)
+            order.append(node)
+        return ContractionHierarchy(problem, order, shortcuts)
+
+    # Returns the shortest path from the start to the goal as a list of nodes (excluding the start), or None if there is no path.
+    # It runs a Dijkstra search upward from the start and another upward from the goal (on the reversed edges),
+    # and each search stops when its lowest distance exceeds the best path found so far.
+    def query(self, start: GraphNode, goal: GraphNode) -> Optional[List[GraphNode]]:
+        if start == goal: return []
+        distances: List[Dict[GraphNode, float]] = [{start: 0}, {goal: 0}]
+        parents: List[Dict[GraphNode, GraphNode]] = [{}, {}]
+        heaps = [[(0, 0, start)], [(0, 0, goal)]]
+        graphs = [self.upward, self.downward]
+        done: List[set] = [set(), set()]
+        order = 1
+        best_cost, meeting = float("inf"), None
+        while heaps[0] or heaps[1]:
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]) else 1
+            distance, _, node = heapq.heappop(heaps[side])
+            if distance >= best_cost:
+                heaps[side].clear()
+                continue
+            if node in done[side]: continue
+            done[side].add(node)
+            if node in distances[1 - side] and distance + distances[1 - side][node] < best_cost:
+                best_cost, meeting = distance + distances[1 - side][node], node
+            for neighbor, cost in graphs[side].get(node, []):
+                new_distance = distance + cost
+                if new_distance < distances[side].get(neighbor, float("inf")):
+                    distances[side][neighbor] = new_distance
+                    parents[side][neighbor] = node
+                    heapq.heappush(heaps[side], (new_distance, order, neighbor))
+                    order += 1
+        if meeting is None: return None
+        # Rebuild the path of (possibly shortcut) edges then unpack the shortcuts
+        nodes = [meeting]
+        while nodes[-1] in parents[0]: nodes.append(parents[0][nodes[-1]])
+        nodes.reverse()
+        while nodes[-1] in parents[1]: nodes.append(parents[1][nodes[-1]])
+        path = []
+        for node, neighbor in zip(nodes, nodes[1:]):
+            path.extend(self.unpack(node, neighbor))
+        return path
+
+    # Returns the original nodes along the edge from node to neighbor (excluding node)
+    def unpack(self, node: GraphNode, neighbor: GraphNode) -> List[GraphNode]:
+        shortcut = self.shortcuts.get((node, neighbor))
+        if shortcut is None: return [neighbor]
+        middle = shortcut[0]
+        return self.unpack(node, middle) + self.unpack(middle, neighbor)
+
+# Returns the path costs from the source to the nodes reachable without going through the excluded node,
+# exploring at most 'limit' nodes and no node farther than 'max_cost'
+def _witness_search(outgoing: Dict[GraphNode, Dict[GraphNode, float]], source: GraphNode, excluded: GraphNode, max_cost: float, limit: int) -> Dict[GraphNode, float]:
+    distances = {source: 0}
+    heap = [(0, 0, source)]
+    order, settled = 1, 0
+    while heap and settled < limit:
+        distance, _, node = heapq.heappop(heap)
+        if distance > distances.get(node, float("inf")): continue
+        if distance > max_cost: break
+        settled += 1
+        for neighbor, cost in outgoing[node].items():
+            if neighbor == excluded: continue
+            new_distance = distance + cost
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, order, neighbor))
+                order += 1
+    return distances
+
+# The preprocessed index of a graph
+# 'landmarks' is a list of (landmark, distances from the landmark, distances to the landmark)
+# where the nodes that are missing from a table cannot be reached from (or cannot reach) the landmark.
+class GraphIndex:
+    def __init__(self, graph_hash: str, landmarks: List[Tuple[GraphNode, Dict[GraphNode, float], Dict[GraphNode, float]]],
+                 contraction: Optional[ContractionHierarchy] = None) -> None:
+        self.graph_hash = graph_hash
+        self.landmarks = landmarks
+        self.contraction = contraction
+
+    @staticmethod
+    def build(problem: GraphRoutingProblem, graph_hash: str, landmarks: int = 8, contraction: bool = False) -> 'GraphIndex':
+        return GraphIndex(graph_hash, select_landmarks(problem, landmarks), ContractionHierarchy.build(problem) if contraction else None)
+
+    # Returns the largest lower bound on the path cost from the state to the goal given by the landmarks
+    # (infinity if a landmark proves that the goal cannot be reached from the state)
+    def lower_bound(self, state: GraphNode, goal: GraphNode) -> float:
+        bound = 0
+        inf = float("inf")
+        for _, forward, backward in self.landmarks:
+            # d(state, goal) >= d(L, goal) - d(L, state)
+            from_state, from_goal = forward.get(state, inf), forward.get(goal, inf)
+            if from_state != inf:
+                bound = max(bound, from_goal - from_state)
+            # d(state, goal) >= d(state, L) - d(goal, L)
+            to_state, to_goal = backward.get(state, inf), backward.get(goal, inf)
+            if to_goal != inf:
+                bound = max(bound, to_state - to_goal)
+        return bound
+
+    def to_json(self) -> Dict:
+        index = {
+            "graph_hash": self.graph_hash,
+            "landmarks": [
+                {"node": landmark.name,
+                 "from": {node.name: distance for node, distance in forward.items()},
+                 "to": {node.name: distance for node, distance in backward.items()}}
+                for landmark, forward, backward in self.landmarks
+            ]
+        }
+        if self.contraction is not None:
+            index["contraction"] = {
+                "order": [node.name for node in sorted(self.contraction.rank, key=self.contraction.rank.get)],
+                "shortcuts": [[node.name, neighbor.name, middle.name, cost] for (node, neighbor), (middle, cost) in self.contraction.shortcuts.items()]
+            }
+        return index
+
+    @staticmethod
+    def from_json(problem: GraphRoutingProblem, index: Dict) -> 'GraphIndex':
+        nodes = {node.name: node for node in problem.adjacency}
+        landmarks = [
+            (nodes[item["node"]],
+             {nodes[name]: distance for name, distance in item["from"].items()},
+             {nodes[name]: distance for name, distance in item["to"].items()})
+            for item in index.get("landmarks", [])
+        ]
+        contraction = None
+        if "contraction" in index:
+            order = [nodes[name] for name in index["contraction"]["order"]]
+            shortcuts = {(nodes[node], nodes[neighbor]): (nodes[middle], cost) for node, neighbor, middle, cost in index["contraction"]["shortcuts"]}
+            contraction = ContractionHierarchy(problem, order, shortcuts)
+        return GraphIndex(index["graph_hash"], landmarks, contraction)
+
+# Returns the path of the index file of a graph file
+def get_index_path(graph_path: str) -> str:
+    return os.path.splitext(graph_path)[0] + ".index.json"
+
+# Loads the index of the graph file from the index file next to it. If the index file does not exist, was built for
+# another version of the graph or does not contain the requested preprocessing, the index is built and saved (if 'save' is True).
+# The index is attached to the problem (as 'problem.index') so the heuristic and the searches can use it.
+def load_graph_index(problem: GraphRoutingProblem, graph_path: str, landmarks: int = 8, contraction: bool = False, save: bool = True) -> GraphIndex:
+    with open(graph_path, 'rb') as f:
+        graph_hash = hashlib.sha256(f.read()).hexdigest()
+    index = getattr(problem, "index", None)
+    landmarks = min(landmarks, len(problem.adjacency))
+    if not _is_usable(index, graph_hash, landmarks, contraction):
+        index_path = get_index_path(graph_path)
+        index = None
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                definition = json.load(f)
+            if definition.get("graph_hash") == graph_hash:
+                index = GraphIndex.from_json(problem, definition)
+        if not _is_usable(index, graph_hash, landmarks, contraction):
+            index = GraphIndex.build(problem, graph_hash, landmarks, contraction)
+            if save:
+                with open(index_path, 'w') as f:
+                    json.dump(index.to_json(), f)
+    problem.index = index
+    return index
+
+def _is_usable(index: Optional[GraphIndex], graph_hash: str, landmarks: int, contraction: bool) -> bool:
+    if index is None or index.graph_hash != graph_hash: return False
+    if len(index.landmarks) < landmarks: return False
+    return index.contraction is not None or not contraction
+
+# This heuristic is the largest of the euclidean distance to the goal and the landmark lower bounds.
+# Both are consistent, so their maximum is consistent too.
+# If no index was loaded for the problem (see load_graph_index), it is the same as graphrouting_heuristic.
+def landmark_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
+    index: Optional[GraphIndex] = getattr(problem, "index", None)
+    h = graphrouting_heuristic(problem, state)
+    if index is None: return h
+    return max(h, index.lower_bound(state, problem.goal))
+
+# Finds the shortest path using the contraction hierarchy of the problem index (see load_graph_index with contraction=True).
+# The actions of the graph routing problem are the nodes along the path.
+def ContractionHierarchySearch(problem: GraphRoutingProblem, initial_state: GraphNode) -> Solution:
+    index: Optional[GraphIndex] = getattr(problem, "index", None)
+    if index is None or index.contraction is None:
+        raise ValueError("The problem has no contraction hierarchy, load it with load_graph_index(..., contraction=True)")
+    return index.contraction.query(initial_state, problem.goal)
+
+if __name__ == "__main__":
+    # Preprocess the graphs and save their indices next to them
+    parser = argparse.ArgumentParser(description="Build the landmark and contraction hierarchy indices of graphs")
+    parser.add_argument("graphs", nargs="+", help="the paths to the graphs to preprocess")
+    parser.add_argument("--landmarks", "-l", type=int, default=8, help="the number of landmarks")
+    parser.add_argument("--contraction", "-c", action="store_true", default=False, help="also build a contraction hierarchy")
+    args = parser.parse_args()
+    for graph_path in args.graphs:
+        problem = GraphRoutingProblem.from_file(graph_path)
+        index = load_graph_index(problem, graph_path, args.landmarks, args.contraction)
+        print(f"{graph_path}: {len(index.landmarks)} landmarks" + (f", {len(index.contraction.shortcuts)} shortcuts" if index.contraction else "") + f" -> {get_index_path(graph_path)}")
@@ -4,16 +4,26 @@ from .utils import add_call_listener
 class InconsistentHeuristicException(Exception):
     pass
 
+def check_transition(heuristic, problem: Problem[S, A], state: S, action: A, c: float, next_state: S):
+    h = heuristic(problem, state)
+    next_h = heuristic(problem, next_state)
+    if h - next_h > c:
+        message = f"State (heuristic = {h}):" + "\n" + str(state) + "\n"
+        message += f"Action: {str(action)} (cost = {c})" + "\n"
+        message += f"Next State (heuristic = {next_h}):" + "\n" + str(next_state) + "\n"
+        message += "Decrease in heuristic exceeds the actions cost\n"
+        message += f"h(state) - h(next state) = {h} - {next_h} = {h - next_h} > {c} (action cost)"
+        raise InconsistentHeuristicException(message)
+
+# Checks the transitions made with get_successor
 def test_heuristic_consistency(heuristic):
     def listener(next_state: S, problem: Problem[S, A], state: S, action: A):
-        h = heuristic(problem, state)
-        next_h = heuristic(problem, next_state)
-        c = problem.get_cost(state, action)
-        if h - next_h > c:
-            message = f"State (heuristic = {h}):" + "\n" + str(state) + "\n"
-            message += f"Action: {str(action)} (cost = {c})" + "\n"
-            message += f"Next State (heuristic = {next_h}):" + "\n" + str(next_state) + "\n"
-            message += "Decrease in heuristic exceeds the actions cost\n"
-            message += f"h(state) - h(next state) = {h} - {next_h} = {h - next_h} > {c} (action cost)"
-            raise InconsistentHeuristicException(message)
-    return add_call_listener(listener)
\ No newline at end of file
+        check_transition(heuristic, problem, state, action, problem.get_cost(state, action), next_state)
+    return add_call_listener(listener)
+
+# Checks the transitions returned by expand (the searches expand the states without calling get_successor)
+def test_expansion_consistency(heuristic):
+    def listener(expansions, problem: Problem[S, A], state: S):
+        for action, next_state, c in expansions:
+            check_transition(heuristic, problem, state, action, c, next_state)
+    return add_call_listener(listener)
@@ -4,7 +4,7 @@ from graph import GraphRoutingProblem, graphrouting_heuristic
 from sokoban import SokobanProblem, Direction
 from problem import A, S, Problem
 from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
-from .heuristic_checks import InconsistentHeuristicException, test_heuristic_consistency
+from .heuristic_checks import InconsistentHeuristicException, test_expansion_consistency, test_heuristic_consistency
 from functools import lru_cache
 import time
 
@@ -51,7 +51,7 @@ def run_uninformed_search_for_graph_routing(
     search_fn = load_function(function_path)
     initial_state = problem.get_initial_state()
     path = search_fn(problem, initial_state)
-    traversal = [call["args"][1] for call in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
+    traversal = [args[1] for args, _ in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
     return (None if path is None else [node.name for node in path]), [node.name for node in traversal]
 
 def run_informed_search_for_graph_routing(
@@ -61,7 +61,7 @@ def run_informed_search_for_graph_routing(
     search_fn = load_function(function_path)
     initial_state = problem.get_initial_state()
     path = search_fn(problem, initial_state, graphrouting_heuristic)
-    traversal = [call["args"][1] for call in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
+    traversal = [args[1] for args, _ in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
     return (None if path is None else [node.name for node in path]), [node.name for node in traversal]
 
 def compare_search_results_for_graph_routing(
@@ -120,8 +120,9 @@ def test_sokoban_heuristic(
     problem: SokobanProblem) -> Tuple[float, int, str, float]:
     fetch_tracked_call_count(SokobanProblem.get_actions)
     heuristic = lru_cache(2**16)(load_function("sokoban_heuristic.strong_heuristic"))
-    original_get_successor = SokobanProblem.get_successor
+    original_get_successor, original_expand = SokobanProblem.get_successor, SokobanProblem.expand
     SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+    SokobanProblem.expand = test_expansion_consistency(heuristic)(SokobanProblem.expand)
     search_fn = load_function(function_path)
     initial_state = problem.get_initial_state()
     message = ""
@@ -132,7 +133,7 @@ def test_sokoban_heuristic(
         message = "Heuristic is inconsistent:\n" + str(err)
         return None, 1e10, message, 0
     finally:
-        SokobanProblem.get_successor = original_get_successor
+        SokobanProblem.get_successor, SokobanProblem.expand = original_get_successor, original_expand
     elapsed = time.time() - start
     explored = fetch_tracked_call_count(SokobanProblem.get_actions)
     path_cost = None
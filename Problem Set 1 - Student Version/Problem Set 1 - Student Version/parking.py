@@ -3,19 +3,23 @@ from problem import Problem
 from mathutils import Direction, Point
 from helpers.utils import NotImplemented
 
-# TODO: (Optional) Instead of Any, you can define a type for the parking state
-ParkingState = Tuple[Point]
+# The parking state is a tuple of cell indices where state[i] is the cell of car 'i'.
+# The cells are the passages numbered in row-major order (see ParkingProblem.compile)
+ParkingState = Tuple[int, ...]
 
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
+# The order in which the moves of each car are listed by get_actions
+ParkingDirections = [Direction.RIGHT, Direction.LEFT, Direction.UP, Direction.DOWN]
+
 # This is the implementation of the parking problem
 
 
 class ParkingProblem(Problem[ParkingState, ParkingAction]):
     # A set of points which indicate where a car can be (in other words, every position except walls).
     passages: Set[Point]
-    # A tuple of points where state[i] is the position of car 'i'.
+    # A tuple of points where cars[i] is the initial position of car 'i'.
     cars: Tuple[Point]
     # A dictionary which indicate the index of the parking slot (if it is 'i' then it is the lot of car 'i') for every position.
     slots: Dict[Point, int]
@@ -26,123 +30,97 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
     values: Dict[str, int] = {'A': 26, 'B': 25, 'C': 24, 'D': 23, 'E': 22, 'F': 21,
                               'G': 20, 'H': 19, 'I': 18, 'J': 17, 'K': 16, 'L': 16, 'M': 15, 'N': 14, 'O': 13}
 
+    # The compiled layout (see compile):
+    #   'positions[c]' is the position of cell c and 'indices' maps each passage to its cell
+    #   'neighbors[d][c]' is the cell next to cell c in the direction d (or -1 if it is a wall)
+    #   'car_values[i]' is the cost of a move of car 'i' (its value)
+    #   'move_costs[i][c]' is the cost of moving car 'i' into cell c (its value plus 100 if c is the slot of another car)
+    #   'goal_cells' is a tuple of (car, cell of its slot)
+    #   'moves' pairs each direction (in the order of get_actions) with its neighbors table
+    positions: List[Point]
+    indices: Dict[Point, int]
+    neighbors: List[List[int]]
+    car_values: List[int]
+    move_costs: List[List[int]]
+    goal_cells: Tuple[Tuple[int, int], ...]
+    moves: List[Tuple[Direction, List[int]]]
+
+    # Precomputes the tables used to generate the actions and the successors
+    def compile(self):
+        self.positions = sorted(self.passages, key=lambda position: (position.y, position.x))
+        self.indices = {position: index for index, position in enumerate(self.positions)}
+        self.neighbors = [
+            [self.indices.get(position + direction.to_vector(), -1) for position in self.positions]
+            for direction in Direction
+        ]
+        slot_owners = [self.slots.get(position, -1) for position in self.positions]
+        self.car_values = [self.values[chr(car + ord('A'))] for car in range(len(self.cars))]
+        self.move_costs = [
+            [value + (100 if owner not in (-1, car) else 0) for owner in slot_owners]
+            for car, value in enumerate(self.car_values)
+        ]
+        self.goal_cells = tuple((car, self.indices[position]) for position, car in self.slots.items() if car < len(self.cars))
+        self.moves = [(direction, self.neighbors[direction]) for direction in ParkingDirections]
+
     # This function should return the initial state
     def get_initial_state(self) -> ParkingState:
-        # TODO: ADD YOUR CODE HERE
-        return self.cars
-
-        # This function should return True if the given state is a goal. Otherwise, it should return False.
+        return tuple(self.indices[car] for car in self.cars)
 
+    # This function should return True if the given state is a goal. Otherwise, it should return False.
     def is_goal(self, state: ParkingState) -> bool:
-        # TODO: ADD YOUR CODE HERE
-        # checking on the x and y corrinates of the state tuple if it matches the requriedgoal
-        # it not in any then not the state
-        for slot in self.slots.keys():
-            if slot.x != state[self.slots[slot]].x or slot.y != state[self.slots[slot]].y:
+        for car, cell in self.goal_cells:
+            if state[car] != cell:
                 return False
-
         return True
 
-        # This function returns a list of all the possible actions that can be applied to the given state
-
+    # This function returns a list of all the possible actions that can be applied to the given state
+    # A car can move to a neighboring passage which is not occupied by another car
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
-        # TODO: ADD YOUR CODE HERE
-
-     # listing down the possible moves according to the action class in point format for addition
-        rightmove = Point(1, 0)
-        lefttmove = Point(-1, 0)
-        upmove = Point(0, -1)
-        downmove = Point(0, 1)
-
-      # creating variables for the new possible positions
-        newrightpos = None
-        newleftpos = None
-        newuppos = None
-        newdownpos = None
-
+        occupied = 0
+        for cell in state: occupied |= 1 << cell
         actions = []
-        for i, car in enumerate(state):
-            # i is the index of the car and car is the position i point format to loop over
-            # itnializing the possible new psotions
-            newrightpos = car+rightmove
-            newleftpos = car+lefttmove
-            newuppos = car+upmove
-            newdownpos = car+downmove
-            # if the new right psotiion is not a wall and not another car slot-> add it to the possible actions
-            if newrightpos in self.passages and newrightpos not in state:
-                actions.append((i, Direction.RIGHT))
-            # if the new left psotiion is not a wall and not another car slot-> add it to the possible actions
-            if newleftpos in self.passages and newleftpos not in state:
-                actions.append((i, Direction.LEFT))
-              # if the new up psotiion is not a wall and not another car slot-> add it to the possible actions
-            if newuppos in self.passages and newuppos not in state:
-                actions.append((i, Direction.UP))
-             # if the new down psotiion is not a wall and not another car slot-> add it to the possible actions
-            if newdownpos in self.passages and newdownpos not in state:
-                actions.append((i, Direction.DOWN))
-
+        for i, cell in enumerate(state):
+            for direction, neighbors in self.moves:
+                target = neighbors[cell]
+                if target >= 0 and not occupied >> target & 1:
+                    actions.append((i, direction))
         return actions
 
-        # This function returns a new state which is the result of applying the given action to the given state
-
+    # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
-        # TODO: ADD YOUR CODE HERE
-        newstate = None
-        index, dir = action  # intialize the index of the car and action direction
-        new_state = list(state)  # the new possible state of the car
-        rightmove = Point(1, 0)  # the possible moves
-        lefttmove = Point(-1, 0)
-        upmove = Point(0, -1)
-        downmove = Point(0, 1)
-        if dir == Direction.DOWN:  # check the direction of movmenet pre intialized to pick which possiblemove is the new state going to be
-            newstate = state[index]+downmove
-        if dir == Direction.UP:
-            newstate = state[index]+upmove
-        if dir == Direction.RIGHT:
-            newstate = state[index]+rightmove
-        if dir == Direction.LEFT:
-            newstate = state[index]+lefttmove
-        # intialzing the successor move
-        new_state[index] = newstate
-        new_state = tuple(new_state)  # the tuple of state to be returned
-
-        return new_state
-        # return newstate
+        index, direction = action
+        target = self.neighbors[direction][state[index]]
+        if target < 0:
+            # If we try to move into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state: {state}")
+        return state[:index] + (target,) + state[index+1:]
 
     # This function returns the cost of applying the given action to the given state
-
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
-        # TODO: ADD YOUR CODE HERE
-        currCost = 0
-        newstate = None
-        new_state = list(state)
-        index, dir = action
-        rightmove = Point(1, 0)
-        lefttmove = Point(-1, 0)
-        upmove = Point(0, -1)
-        downmove = Point(0, 1)
-        if dir == Direction.DOWN:
-            newstate = state[index]+downmove
-        if dir == Direction.UP:
-            newstate = state[index]+upmove
-        if dir == Direction.RIGHT:
-            newstate = state[index]+rightmove
-        if dir == Direction.LEFT:
-            newstate = state[index]+lefttmove
-
-        new_state[index] = newstate
-        new_state = tuple(new_state)
-        # check if the new state is possible , not a wall and not another car's slot , if yes
-        if newstate in self.passages:
-            # convert the position to chr accordingly to realize the cost of moving
-            currCost += self.values[chr(index + ord('A'))]
-
-        if newstate in self.slots.keys():  # check if the new state is already another car's slot to pay the 100 cost of getting in another car's room
-            if index != self.slots[newstate]:
-
-                currCost += 100
-
-        return currCost
+        index, direction = action
+        target = self.neighbors[direction][state[index]]
+        # Moving into a wall does not cost anything (and is not a valid action)
+        if target < 0: return 0
+        return self.move_costs[index][target]
+
+    # Returns the (action, successor, cost) of every possible action in the same order as get_actions,
+    # computing the target cell of each move once instead of once in each of get_actions, get_successor and get_cost
+    def expand(self, state: ParkingState) -> List[Tuple[ParkingAction, ParkingState, float]]:
+        occupied = 0
+        for cell in state: occupied |= 1 << cell
+        expansions = []
+        for i, cell in enumerate(state):
+            costs = self.move_costs[i]
+            before, after = state[:i], state[i+1:]
+            for direction, neighbors in self.moves:
+                target = neighbors[cell]
+                if target >= 0 and not occupied >> target & 1:
+                    expansions.append(((i, direction), before + (target,) + after, costs[target]))
+        return expansions
+
+    # Returns the positions of the cars in the given state
+    def get_positions(self, state: ParkingState) -> Tuple[Point, ...]:
+        return tuple(self.positions[cell] for cell in state)
 
     # Read a parking problem from text containing a grid of tiles
 
@@ -169,6 +147,7 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         problem.slots = {position: index for index, position in slots.items()}
         problem.width = width
         problem.height = height
+        problem.compile()
         return problem
 
     # Read a parking problem from file containing a grid of tiles
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import deque
+import argparse, hashlib, heapq, json, os
+
+from parking import ParkingProblem, ParkingState
+
+# This file contains admissible and consistent heuristics for the parking problem.
+# Every move of car 'i' costs at least values[i], so the cost to park the cars is at least
+# the sum over the cars of values[i] times the number of moves that car 'i' needs to reach its slot.
+# The pattern databases improve on this by solving the problem exactly for small groups of cars
+# (with the other cars removed) and storing the cost of every placement of the group.
+# Since each move is made by a single car, it is only counted by the database of the group of that car,
+# so the costs of the databases of disjoint groups can be added (additive pattern databases).
+
+# Returns, for every car, the number of moves from each cell to the slot of the car (ignoring the other cars).
+# A cell that is missing from the map of a car cannot reach its slot. A car without a slot has an empty map.
+# The maps only depend on the layout, so they are computed once and stored in the cache.
+def get_slot_distances(problem: ParkingProblem) -> List[Dict[int, int]]:
+    maps = problem.cache().get("slot_distances")
+    if maps is None:
+        slots = dict(problem.goal_cells)
+        maps = []
+        for car in range(len(problem.cars)):
+            if car not in slots:
+                maps.append({})
+                continue
+            distances = {slots[car]: 0}
+            queue = deque([slots[car]])
+            while queue:
+                cell = queue.popleft()
+                for neighbors in problem.neighbors:
+                    next_cell = neighbors[cell]
+                    if next_cell < 0 or next_cell in distances: continue
+                    distances[next_cell] = distances[cell] + 1
+                    queue.append(next_cell)
+            maps.append(distances)
+        problem.cache()["slot_distances"] = maps
+    return maps
+
+# This heuristic is the sum over the cars of the value of the car times its distance to its slot.
+# A move of a car costs at least its value and changes its distance by at most 1, so the heuristic is consistent.
+def parking_distance_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    maps = get_slot_distances(problem)
+    values = problem.car_values
+    h = 0
+    for car, cell in enumerate(state):
+        distances = maps[car]
+        if not distances: continue
+        distance = distances.get(cell)
+        if distance is None: return float("inf")
+        h += values[car] * distance
+    return h
+
+# A pattern database of a group of cars: 'costs' maps the cells of the cars of the group (in the order of 'cars')
+# to the least cost to park them when the other cars are removed (the placements missing from it cannot be parked)
+class PatternDatabase:
+    def __init__(self, cars: Tuple[int, ...], costs: Dict[Tuple[int, ...], float]) -> None:
+        self.cars = cars
+        self.costs = costs
+
+    # Computes the costs with a Dijkstra search backward from the goal placement of the group
+    # (a car moving from cell 'a' to cell 'b' costs move_costs[car][b], so moving back from 'b' to 'a' has the same cost)
+    @staticmethod
+    def build(problem: ParkingProblem, cars: Sequence[int]) -> 'PatternDatabase':
+        slots = dict(problem.goal_cells)
+        cars = tuple(cars)
+        goal = tuple(slots[car] for car in cars)
+        costs: Dict[Tuple[int, ...], float] = {goal: 0}
+        heap = [(0, goal)]
+        while heap:
+            cost, placement = heapq.heappop(heap)
+            if cost > costs[placement]: continue
+            for index, car in enumerate(cars):
+                cell = placement[index]
+                step_cost = cost + problem.move_costs[car][cell]
+                for neighbors in problem.neighbors:
+                    previous = neighbors[cell]
+                    if previous < 0 or previous in placement: continue
+                    previous_placement = placement[:index] + (previous,) + placement[index+1:]
+                    if step_cost < costs.get(previous_placement, float("inf")):
+                        costs[previous_placement] = step_cost
+                        heapq.heappush(heap, (step_cost, previous_placement))
+        return PatternDatabase(cars, costs)
+
+    def lookup(self, state: ParkingState) -> float:
+        return self.costs.get(tuple(state[car] for car in self.cars), float("inf"))
+
+    def to_json(self) -> Dict:
+        return {"cars": list(self.cars), "costs": [[list(placement), cost] for placement, cost in self.costs.items()]}
+
+    @staticmethod
+    def from_json(definition: Dict) -> 'PatternDatabase':
+        return PatternDatabase(tuple(definition["cars"]), {tuple(placement): cost for placement, cost in definition["costs"]})
+
+# Splits the cars that have a slot into groups of at most 'group_size' cars (in order)
+def default_groups(problem: ParkingProblem, group_size: int = 2) -> List[Tuple[int, ...]]:
+    cars = sorted(car for car, _ in problem.goal_cells)
+    return [tuple(cars[i:i+group_size]) for i in range(0, len(cars), group_size)]
+
+# A hash of everything that the pattern databases depend on (the passages, the slots and the move costs)
+def get_layout_hash(problem: ParkingProblem) -> str:
+    layout = {
+        "passages": [[position.x, position.y] for position in problem.positions],
+        "goal_cells": problem.goal_cells,
+        "move_costs": problem.move_costs,
+    }
+    return hashlib.sha256(json.dumps(layout).encode()).hexdigest()
+
+# Returns the path of the pattern database file of a parking lot file
+def get_database_path(park_path: str) -> str:
+    return os.path.splitext(park_path)[0] + ".pdb.json"
+
+# Loads the pattern databases of the groups from the file (if it was built for the same layout and groups),
+# otherwise builds them and saves them to the file (if a path is given).
+# The databases are stored in the problem cache so that parking_pdb_heuristic can use them.
+def load_pattern_databases(problem: ParkingProblem, path: Optional[str] = None, groups: Optional[List[Tuple[int, ...]]] = None) -> List[PatternDatabase]:
+    if groups is None: groups = default_groups(problem)
+    groups = [tuple(group) for group in groups]
+    layout_hash = get_layout_hash(problem)
+    databases = None
+    if path is not None and os.path.exists(path):
+        with open(path, 'r') as f:
+            definition = json.load(f)
+        if definition.get("layout_hash") == layout_hash and [tuple(item["cars"]) for item in definition["databases"]] == groups:
+            databases = [PatternDatabase.from_json(item) for item in definition["databases"]]
+    if databases is None:
+        databases = [PatternDatabase.build(problem, group) for group in groups]
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump({"layout_hash": layout_hash, "databases": [database.to_json() for database in databases]}, f)
+    problem.cache()["pattern_databases"] = databases
+    return databases
+
+# This heuristic is the sum of the costs of the pattern databases stored in the cache (see load_pattern_databases)
+# plus the distance heuristic of the cars that are not in any database.
+# If no databases were loaded, the default groups are built (but not saved) the first time it is called.
+def parking_pdb_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    databases: List[PatternDatabase] = problem.cache().get("pattern_databases")
+    if databases is None:
+        databases = load_pattern_databases(problem)
+    h = 0
+    covered = problem.cache().get("pattern_cars")
+    if covered is None:
+        covered = problem.cache()["pattern_cars"] = {car for database in databases for car in database.cars}
+    for database in databases:
+        h += database.lookup(state)
+    if len(covered) < len(state):
+        maps, values = get_slot_distances(problem), problem.car_values
+        for car, cell in enumerate(state):
+            if car in covered or not maps[car]: continue
+            distance = maps[car].get(cell)
+            if distance is None: return float("inf")
+            h += values[car] * distance
+    return h
+
+if __name__ == "__main__":
+    # Build the pattern databases of parking lots and save them next to them
+    parser = argparse.ArgumentParser(description="Build the pattern databases of parking lots")
+    parser.add_argument("parks", nargs="+", help="the paths to the parking lots")
+    parser.add_argument("--group-size", "-g", type=int, default=2, help="the number of cars in each pattern database")
+    args = parser.parse_args()
+    for park_path in args.parks:
+        problem = ParkingProblem.from_file(park_path)
+        databases = load_pattern_databases(problem, get_database_path(park_path), default_groups(problem, args.group_size))
+        print(f"{park_path}: {sum(len(database.costs) for database in databases)} entries in {len(databases)} databases -> {get_database_path(park_path)}")
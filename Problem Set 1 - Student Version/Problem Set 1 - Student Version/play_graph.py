@@ -1,6 +1,6 @@
 import time
 from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, SolutionCache
 from helpers.utils import fetch_recorded_calls
 import argparse, os, json
 
@@ -41,6 +41,37 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "gbfs":
         from search import BestFirstSearch
         return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStarSearch
+        return InformedSearchAgent(IterativeDeepeningAStarSearch, graphrouting_heuristic)
+    if agent_type == "rbfs":
+        from search import RecursiveBestFirstSearch
+        return InformedSearchAgent(RecursiveBestFirstSearch, graphrouting_heuristic)
+    if agent_type == "bibfs":
+        from search import BidirectionalBreadthFirstSearch
+        return UninformedSearchAgent(BidirectionalBreadthFirstSearch)
+    if agent_type == "biucs":
+        from search import BidirectionalUniformCostSearch
+        return UninformedSearchAgent(BidirectionalUniformCostSearch)
+    if agent_type == "biastar":
+        from search import BidirectionalAStarSearch
+        return InformedSearchAgent(BidirectionalAStarSearch, graphrouting_heuristic)
+    if agent_type == "altastar":
+        from search import AStarSearch
+        from graph_index import landmark_heuristic
+        return InformedSearchAgent(AStarSearch, landmark_heuristic)
+    if agent_type == "ch":
+        from graph_index import ContractionHierarchySearch
+        return UninformedSearchAgent(ContractionHierarchySearch)
+    if agent_type in ("arastar", "beam"):
+        from search import AnytimeRepairingAStarSearch, BeamSearch
+        # The anytime searches print every solution they find with its suboptimality bound
+        report = lambda solution, cost, bound: print(f"Found a solution with cost {cost} (at most {bound:.3f} times the optimal cost)")
+        if agent_type == "arastar":
+            search_fn = lambda problem, state, heuristic: AnytimeRepairingAStarSearch(problem, state, heuristic, args.weight, args.weight_step, args.time_limit, report)
+        else:
+            search_fn = lambda problem, state, heuristic: BeamSearch(problem, state, heuristic, args.beam_width, args.time_limit, report)
+        return InformedSearchAgent(search_fn, graphrouting_heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -48,6 +79,10 @@ def main(args: argparse.Namespace):
     start = time.time() # Track run time
     graph_path = args.graph
     problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+    # The landmark and contraction hierarchy agents need the graph index (which is built and saved next to the graph if needed)
+    if args.agent in ("altastar", "ch"):
+        from graph_index import load_graph_index
+        load_graph_index(problem, graph_path, args.landmarks, contraction=(args.agent == "ch"))
     # Check if there is a figure for the graph that we can display on the console
     figure_path = json.load(open(graph_path, 'r')).get("figure")
     figure = None
@@ -61,15 +96,20 @@ def main(args: argparse.Namespace):
         print(figure)
     print("Current Node:", state)
     agent = create_agent(args)
+    if args.solution_cache and not isinstance(agent, HumanAgent):
+        # Keep the results of all the searches (the searches that minimize the number of steps, follow the heuristic or are anytime are not optimal).
+        # The anytime searches can give up (run out of time or prune every path), so their failures do not prove that there is no path
+        agent.solution_cache = SolutionCache(args.solution_cache, optimal=args.agent not in ("bfs", "dfs", "gbfs", "bibfs", "arastar", "beam"),
+                                             complete=args.agent not in ("arastar", "beam"))
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
-        fetch_recorded_calls(GraphRoutingProblem.is_goal) # Clear the recorded calls
+        fetch_recorded_calls(GraphRoutingProblem.get_actions) # Clear the recorded calls
         action = agent.act(problem, state) # Request an action from the agent
         # Retrieve the traversed nodes
-        traversed_nodes += [call["args"][1].name for call in list(fetch_recorded_calls(GraphRoutingProblem.is_goal))]
+        traversed_nodes += [args[1].name for args, _ in fetch_recorded_calls(GraphRoutingProblem.get_actions)]
         # If no solution was found, break
         if action is None:
             print("Agent cannot find a solution, exiting...")
@@ -100,8 +140,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar', 'rbfs', 'bibfs', 'biucs', 'biastar', 'altastar', 'ch', 'arastar', 'beam'],
                         help="the agent that will play the game")
+    parser.add_argument("--landmarks", "-l", type=int, default=8,
+                        help="the number of landmarks in the graph index (used by the 'altastar' and 'ch' agents)")
+    parser.add_argument("--weight", "-w", type=float, default=3.0,
+                        help="the initial weight of the heuristic in anytime repairing A* (arastar)")
+    parser.add_argument("--weight-step", "-ws", type=float, default=0.5,
+                        help="how much the weight of the heuristic decreases after each solution of anytime repairing A* (arastar)")
+    parser.add_argument("--beam-width", "-bw", type=int, default=64,
+                        help="the number of states kept at each level of the beam search (beam)")
+    parser.add_argument("--time-limit", "-t", type=float, default=None,
+                        help="the time budget in seconds of each search of the anytime agents (arastar and beam), which return the best solution found when it runs out")
+    parser.add_argument("--solution-cache", "-sc", type=int, default=0,
+                        help="the maximum number of states kept in the cache of the search results shared by all the searches of the agent (0 to only keep the last path)")
 
     args = parser.parse_args()
     try:
@@ -1,8 +1,8 @@
 from typing import List
-from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
-from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from sokoban import SokobanProblem, CompactSokobanProblem, Direction, SokobanState, SokobanTile, compact_heuristic
+from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent, SolutionCache
 from helpers.utils import fetch_tracked_call_count
-from helpers.heuristic_checks import test_heuristic_consistency
+from helpers.heuristic_checks import test_expansion_consistency, test_heuristic_consistency
 from functools import lru_cache
 import argparse, time
 
@@ -18,7 +18,14 @@ def colored_sokoban(level: str):
     return level
 
 # Return the heuristic selected by the user
-def get_heuristic(name: str):
+def get_heuristic(name: str, compact: bool = False, push: bool = False):
+    if push and name != "zero":
+        # The push-level search needs a heuristic that estimates the number of pushes
+        from sokoban_push import push_heuristic
+        return push_heuristic
+    if compact and name != "zero":
+        # The heuristics are written for SokobanProblem, so they receive the decoded states
+        return compact_heuristic(get_heuristic(name))
     if name == "zero":
         return lambda *_: 0
     if name == "weak":
@@ -33,6 +40,10 @@ def get_heuristic(name: str):
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
+    problem_class = CompactSokobanProblem if args.compact else SokobanProblem
+    if args.push:
+        from sokoban_push import SokobanPushProblem
+        problem_class = SokobanPushProblem
     if agent_type == "human":
         # This function reads the action from the user (human)
         def sokoban_user_action(problem: SokobanProblem, state: SokobanState) -> Direction:
@@ -62,19 +73,46 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "astar":
         from search import AStarSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic, args.compact, args.push))
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
+            problem_class.expand = test_expansion_consistency(heuristic)(problem_class.expand)
         return InformedSearchAgent(AStarSearch, heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
-        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic, args.compact, args.push))
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
+            problem_class.expand = test_expansion_consistency(heuristic)(problem_class.expand)
         return InformedSearchAgent(BestFirstSearch, heuristic)
+    if agent_type in ("idastar", "rbfs"):
+        from search import IterativeDeepeningAStarSearch, RecursiveBestFirstSearch
+        # These searches only keep the current path (and, for IDA*, a transposition table limited by the user) in memory
+        if agent_type == "idastar":
+            search_fn = lambda problem, state, heuristic: IterativeDeepeningAStarSearch(problem, state, heuristic, args.max_cached_states)
+        else:
+            search_fn = RecursiveBestFirstSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic, args.compact, args.push))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
+            problem_class.expand = test_expansion_consistency(heuristic)(problem_class.expand)
+        return InformedSearchAgent(search_fn, heuristic)
+    if agent_type in ("arastar", "beam"):
+        from search import AnytimeRepairingAStarSearch, BeamSearch
+        # The anytime searches print every solution they find with its suboptimality bound
+        report = lambda solution, cost, bound: print(f"Found a solution with cost {cost} (at most {bound:.3f} times the optimal cost)")
+        if agent_type == "arastar":
+            search_fn = lambda problem, state, heuristic: AnytimeRepairingAStarSearch(problem, state, heuristic, args.weight, args.weight_step, args.time_limit, report)
+        else:
+            search_fn = lambda problem, state, heuristic: BeamSearch(problem, state, heuristic, args.beam_width, args.time_limit, report)
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic, args.compact, args.push))
+        return InformedSearchAgent(search_fn, heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -82,16 +120,29 @@ def main(args: argparse.Namespace):
     state_printer = lambda state: print(state)
     if args.ansicolors: state_printer = lambda state: print(colored_sokoban(str(state)))
     start = time.time() # Track run time
-    problem = SokobanProblem.from_file(args.level) # create the problem
+    problem_class = CompactSokobanProblem if args.compact else SokobanProblem
+    problem = problem_class.from_file(args.level, prune_deadlocks=args.prune_deadlocks) # create the problem
     state = problem.get_initial_state() # Get the initial state
     print("Initial State:")
     state_printer(state)
     agent = create_agent(args)
+    if args.solution_cache and not isinstance(agent, HumanAgent):
+        # Keep the results of all the searches (the step costs are all 1, so only DFS, greedy best first search and the anytime searches
+        # are not optimal, and the push-level searches minimize the pushes instead of the steps).
+        # The anytime searches can give up (run out of time or prune every path), so their failures do not prove that there is no path
+        agent.solution_cache = SolutionCache(args.solution_cache, optimal=args.agent not in ("dfs", "gbfs", "arastar", "beam") and not args.push,
+                                             complete=args.agent not in ("arastar", "beam"))
+    searched_class = problem_class # The problem class whose get_actions calls are the explored nodes
+    if args.push and not isinstance(agent, HumanAgent):
+        # Search over the pushes and play the steps of the solution
+        from sokoban_push import SokobanPushProblem, search_pushes
+        agent.search_fn = search_pushes(agent.search_fn)
+        searched_class = SokobanPushProblem
     step = 0 # This will store the current step
     total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
-        fetch_tracked_call_count(SokobanProblem.is_goal) # Clear the call counter
+        fetch_tracked_call_count(searched_class.get_actions) # Clear the call counter
         action = agent.act(problem, state) # Request an action from the agent
         # If no solution was found, break
         if action is None:
@@ -99,7 +150,7 @@ def main(args: argparse.Namespace):
             unsolvable = True
             break
         # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(SokobanProblem.is_goal)
+        total_explored_nodes += fetch_tracked_call_count(searched_class.get_actions)
         # Apply the action to the state
         state = problem.get_successor(state, action)
         step += 1
@@ -110,7 +161,12 @@ def main(args: argparse.Namespace):
     if not unsolvable: 
         # If desired by the user, we check that the heuristic is zero at the goal state
         if args.checks and isinstance(agent, InformedSearchAgent):
-            goal_heuristic = agent.heuristic(problem, state)
+            if args.push:
+                # The push-level heuristic is checked on the push-level goal state
+                push_problem = SokobanPushProblem.from_problem(problem, state)
+                goal_heuristic = agent.heuristic(push_problem, push_problem.get_initial_state())
+            else:
+                goal_heuristic = agent.heuristic(problem, state)
             if goal_heuristic != 0:
                 print(f"ERROR: Expected heuristic at goal to be 0, got {goal_heuristic}")
         print("YOU WON!!")
@@ -126,11 +182,29 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar', 'rbfs', 'arastar', 'beam'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
                         choices=["zero", "weak", "strong"],
                         help="choose the heuristic to use with A* or Greedy Best First Search")
+    parser.add_argument("--max-cached-states", "-m", type=int, default=2**18,
+                        help="the maximum number of states kept in the transposition table of IDA* (0 to only keep the current path)")
+    parser.add_argument("--weight", "-w", type=float, default=3.0,
+                        help="the initial weight of the heuristic in anytime repairing A* (arastar)")
+    parser.add_argument("--weight-step", "-ws", type=float, default=0.5,
+                        help="how much the weight of the heuristic decreases after each solution of anytime repairing A* (arastar)")
+    parser.add_argument("--beam-width", "-bw", type=int, default=64,
+                        help="the number of states kept at each level of the beam search (beam)")
+    parser.add_argument("--time-limit", "-t", type=float, default=None,
+                        help="the time budget in seconds of each search of the anytime agents (arastar and beam), which return the best solution found when it runs out")
+    parser.add_argument("--compact", "-cs", action="store_true", default=False,
+                        help="Search over the compact (integer-encoded) states, which is faster and uses less memory")
+    parser.add_argument("--prune-deadlocks", "-pd", action="store_true", default=False,
+                        help="Skip the pushes that lead to deadlocks (the solutions are the same but fewer nodes are explored)")
+    parser.add_argument("--push", "-p", action="store_true", default=False,
+                        help="Search over the pushes instead of the steps (the solutions minimize the number of pushes, and the 'weak' and 'strong' heuristics are replaced by the push distance heuristic)")
+    parser.add_argument("--solution-cache", "-sc", type=int, default=0,
+                        help="the maximum number of states kept in the cache of the search results shared by all the searches of the agent (0 to only keep the last path)")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
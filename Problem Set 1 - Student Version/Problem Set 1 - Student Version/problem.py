@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -34,6 +34,14 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # This function returns the (action, next state, action cost) of every possible action from the given state
+    # in the order of get_actions. The searches use it to expand a state with a single call.
+    # The problems can override it to compute the next states and the costs together (e.g. without checking the actions again),
+    # but if get_actions is tracked (to count the expanded nodes or record the traversal), the override must still call it once.
+    def expand(self, state: S) -> Iterable[Tuple[A, S, float]]:
+        get_successor, get_cost = self.get_successor, self.get_cost
+        return [(action, get_successor(state, action), get_cost(state, action)) for action in self.get_actions(state)]
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
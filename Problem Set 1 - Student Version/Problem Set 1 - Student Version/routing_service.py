@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from collections import OrderedDict
+from array import array
+import argparse, heapq, sys
+
+from graph import GraphRoutingProblem, GraphNode
+from mathutils import euclidean_distance
+
+# This file contains a routing service which answers many routing queries over the same graph.
+# Instead of creating a GraphRoutingProblem and running a new search for every query, the service:
+#   1. Loads the graph once and stores it in a compact form: the nodes are numbered and the edges of every node
+#      are stored contiguously in flat arrays (compressed sparse rows), with the edge costs computed once.
+#   2. Answers the queries by growing a shortest path tree (Dijkstra) from their start node.
+#      The trees are kept in a cache by start node, and a tree is only grown until the requested goal is settled,
+#      so later queries from the same start node resume it instead of searching again.
+
+NodeLike = Union[str, GraphNode]
+
+# A route found by the service: the total cost and the nodes from the start to the goal (excluding the start),
+# which are also the actions of the graph routing problem
+@dataclass(frozen=True)
+class Route:
+    cost: float
+    path: List[GraphNode]
+
+# A shortest path tree rooted at a source node. Dijkstra's search is paused once the requested node is settled
+# and resumed when a farther node is requested.
+class _ShortestPathTree:
+    def __init__(self, source: int, size: int) -> None:
+        self.distances = array('d', [float("inf")]) * size
+        self.parents = array('i', [-1]) * size
+        self.settled = bytearray(size)
+        self.distances[source] = 0
+        self.heap: List[Tuple[float, int]] = [(0, source)]
+
+    # Continues the search until the target is settled (or every reachable node is, if the target is None)
+    # and returns whether the target was reached
+    def settle(self, target: Optional[int], offsets: array, targets: array, costs: array) -> bool:
+        distances, parents, settled, heap = self.distances, self.parents, self.settled, self.heap
+        if target is not None and settled[target]: return True
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if settled[node]: continue
+            settled[node] = 1
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[edge]
+                new_distance = distance + costs[edge]
+                if new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    parents[neighbor] = node
+                    heapq.heappush(heap, (new_distance, neighbor))
+            if node == target: return True
+        return target is not None and bool(settled[target])
+
+class RoutingService:
+    # 'max_trees' is the number of shortest path trees kept in the cache (the least recently used tree is evicted first)
+    def __init__(self, adjacency: Dict[GraphNode, List[GraphNode]], max_trees: int = 64) -> None:
+        self.nodes: List[GraphNode] = sorted(adjacency, key=lambda node: node.name)
+        self.indices: Dict[GraphNode, int] = {node: index for index, node in enumerate(self.nodes)}
+        self.names: Dict[str, int] = {node.name: index for index, node in enumerate(self.nodes)}
+        # The edges of node i are targets[offsets[i]:offsets[i+1]] and their costs are costs[offsets[i]:offsets[i+1]]
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.costs = array('d')
+        for node in self.nodes:
+            for neighbor in adjacency[node]:
+                self.targets.append(self.indices[neighbor])
+                self.costs.append(euclidean_distance(node.position, neighbor.position))
+            self.offsets.append(len(self.targets))
+        self.max_trees = max_trees
+        self.trees: 'OrderedDict[int, _ShortestPathTree]' = OrderedDict()
+
+    @staticmethod
+    def from_file(path: str, max_trees: int = 64) -> 'RoutingService':
+        return RoutingService(GraphRoutingProblem.from_file(path).adjacency, max_trees)
+
+    def _index(self, node: NodeLike) -> int:
+        return self.names[node] if isinstance(node, str) else self.indices[node]
+
+    # Returns the shortest path tree of the source from the cache (or a new one) and marks it as recently used
+    def _tree(self, source: int) -> _ShortestPathTree:
+        tree = self.trees.get(source)
+        if tree is None:
+            tree = self.trees[source] = _ShortestPathTree(source, len(self.nodes))
+            if len(self.trees) > self.max_trees: self.trees.popitem(last=False)
+        else:
+            self.trees.move_to_end(source)
+        return tree
+
+    # Returns the cheapest route from the start to the goal (or None if the goal cannot be reached)
+    def route(self, start: NodeLike, goal: NodeLike) -> Optional[Route]:
+        source, target = self._index(start), self._index(goal)
+        tree = self._tree(source)
+        if not tree.settle(target, self.offsets, self.targets, self.costs): return None
+        path = []
+        node = target
+        while node != source:
+            path.append(self.nodes[node])
+            node = tree.parents[node]
+        path.reverse()
+        return Route(tree.distances[target], path)
+
+    # Answers the queries grouped by start node, so each shortest path tree is grown once for all the goals of its start node
+    # (the routes are returned in the order of the queries)
+    def routes(self, queries: Iterable[Tuple[NodeLike, NodeLike]]) -> List[Optional[Route]]:
+        queries = list(queries)
+        order = sorted(range(len(queries)), key=lambda i: self._index(queries[i][0]))
+        routes: List[Optional[Route]] = [None] * len(queries)
+        for i in order:
+            routes[i] = self.route(*queries[i])
+        return routes
+
+    # Returns the path cost from the start to every node that can be reached from it (one-to-many)
+    def distances_from(self, start: NodeLike) -> Dict[GraphNode, float]:
+        tree = self._tree(self._index(start))
+        tree.settle(None, self.offsets, self.targets, self.costs)
+        return {self.nodes[index]: distance for index, distance in enumerate(tree.distances) if distance != float("inf")}
+
+    # Discards the cached shortest path trees
+    def clear(self):
+        self.trees.clear()
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Find the routes between many pairs of nodes of a graph")
+    parser.add_argument("graph", help="path to the graph")
+    parser.add_argument("queries", nargs="*",
+                        help="the queries as 'start:goal' (if none is given, they are read from the standard input, one per line)")
+    parser.add_argument("--max-trees", "-t", type=int, default=64, help="the number of shortest path trees kept in the cache")
+    args = parser.parse_args()
+    service = RoutingService.from_file(args.graph, args.max_trees)
+    lines = args.queries or [line.strip() for line in sys.stdin if line.strip()]
+    queries = [tuple(line.split(":", 1)) for line in lines]
+    for (start, goal), route in zip(queries, service.routes(queries)):
+        if route is None:
+            print(f"{start} -> {goal}: No solution")
+        else:
+            print(f"{start} -> {goal}: {'->'.join([start] + [node.name for node in route.path])} (cost: {route.cost})")
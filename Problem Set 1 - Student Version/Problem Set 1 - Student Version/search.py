@@ -1,13 +1,14 @@
 from problem import HeuristicFunction, Problem, S, A, Solution
 from collections import deque
 from helpers.utils import NotImplemented
-import queue
-from queue import PriorityQueue, Queue
+from typing import Callable, Dict, Generic, List, Optional, Tuple
+from itertools import count
 # TODO: Import any modules you want to use
-import heapq
+import heapq, time
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
+# The states are expanded with problem.expand which returns the action, the next state and the cost of every possible action
 # S and A are used for generic typing where S represents the state type and A represents the action type
 
 # All the search functions should return one of two possible type:
@@ -16,72 +17,24 @@ import heapq
 
 
 def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    explored = set()
-    pathe = []  # action path
-    path = []  # stetes path
-    # node = [initial_state]
-    frontier = [initial_state]  # list of states FIFO
-
-    # list of parents of each node
-    parents = {initial_state: ('null', initial_state)}
+    if problem.is_goal(initial_state):
+        return []
+    frontier = deque([initial_state])  # FIFO queue of states
+    # The states that were ever added to the frontier (explored or not), so each state is added at most once
+    seen = {initial_state}
+    parents: Dict[S, Tuple[S, A]] = {}
 
     while frontier:
-        # last state in FIFO
-        node = frontier.pop(0)
-        if node not in explored:  # add to visitied if not have been before , check and do else
-
-            explored.add(node)
-        else:  # to avoid double expansion
-            continue
-
-        # loop over possible actions from a state
-        for action in problem.get_actions(node):
-
-            # get successor of current node
-            child = problem.get_successor(node, action)
-            if child == action:
-                flag = 0  # graph #know the kind of question to see if return states or paths
-            else:
-                flag = 1  # suko
-
-            if child not in explored and child not in frontier:
-                if problem.is_goal(child):  # if goal reached
-                    if flag == 0:
-                        # intialize parent of current child
-                        parents[child] = (node, action)
-                        path.append(child)
-                        newnode = path[0]
-                        parent = parents[newnode]
-                        prev = parent[0]
-
-                        while prev != initial_state:
-                            path.append(prev)  # append the state
-                            parent = parents[prev]  # fro looping
-                            prev = parent[0]
-
-                        path.reverse()
-                        return path
-
-                    else:
-                        pathe.append(action)  # append the action case of suko
-                        parent_tuple = parents[node]  # parent of that child
-                        parent = parent_tuple[0]
-                        actioon = parent_tuple[1]
-                        while parent != 'null':
-                            # getting parent of the node called parent "originally was child"
-                            pathe.append(actioon)
-                            # parent is a key tuple and we want it equal to first element only
-                            parent_tuple = parents[parent]
-                            parent = parent_tuple[0]
-                            actioon = parent_tuple[1]
-
-                        pathe.reverse()
-                        return pathe
-                        # explored.add(child)
-                else:
-
-                    parents[child] = (node, action)  # intialize parent
-                    frontier.append(child)  # add to frontier and move forword
+        node = frontier.popleft()
+        for action, child, _ in problem.expand(node):
+            if child in seen:
+                continue
+            parents[child] = (node, action)
+            # The goal test is done when the child is generated, so the search stops one level earlier
+            if problem.is_goal(child):
+                return reconstruct_path(parents, child)
+            seen.add(child)
+            frontier.append(child)
 
     return None
 
@@ -140,10 +93,9 @@ def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
                 # explored.add(child)
 
         # loop over possible actions from a state
-        for action in problem.get_actions(node):
+        # (with the successor of current node for each action)
+        for action, child, _ in problem.expand(node):
 
-            # get successor of current node
-            child = problem.get_successor(node, action)
             if child == action:
                 flag = 0  # graph #know the kind of question to see if return states or paths
             else:
@@ -158,276 +110,470 @@ def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
 
 
 def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-
+    frontier: PriorityFrontier[S] = PriorityFrontier()
+    frontier.push(initial_state, 0)
+    costs = {initial_state: 0}  # the best known path cost to each state in the frontier or explored
+    parents: Dict[S, Tuple[S, A]] = {}
     explored = set()
-    exploredOrder = {}
-    order = 0
-    pathe = []
-    explored = {}
-    explored[initial_state] = 0
-    exploredOrder[initial_state] = 0
-    frontier = queue.PriorityQueue()
-    frontier.put((0, order, initial_state))
-    parents = {initial_state: ('null', initial_state)}
-
-    while not frontier.empty():
 
-        dequeued_item = frontier.get()
-        node = dequeued_item[2]
-        nodePri = dequeued_item[0]
+    while frontier:
+        _, node = frontier.pop()
         if problem.is_goal(node):
-            if flag == 0:
-                path = [node]
-                prev = node
-
-                while prev != initial_state:
-                    parent = parents[prev][0]
-                    path.append(parent)
-                    prev = parent
-
-                path.reverse()
-                path.pop(0)
-                return path
-
-            else:
-                parent_tuple = parents[node]  # parent of that child
-                parent = parent_tuple[0]
-                actioon = parent_tuple[1]
-                while parent != 'null':
-                    # getting parent of the node called parent "originally was child"
-                    pathe.append(actioon)
-                    # parent is a key tuple and we want it equal to first element only
-                    parent_tuple = parents[parent]
-                    parent = parent_tuple[0]
-                    actioon = parent_tuple[1]
-                # end of while
-
-                pathe.reverse()
-                return pathe
+            return reconstruct_path(parents, node)
+        explored.add(node)
+        cost = costs[node]
+        for action, child, action_cost in problem.expand(node):
+            if child in explored:
+                continue
+            child_cost = cost + action_cost
+            if frontier.push(child, child_cost):
+                costs[child] = child_cost
+                parents[child] = (node, action)
 
-        else:
-
-            for action in problem.get_actions(node):
-
-                child = problem.get_successor(node, action)
-                if child == action:
-                    flag = 0  # graph
-                else:
-                    flag = 1  # dung
-                frontierlist = list(frontier.queue)
-                if child not in explored:
-                    # explored.add(child)
-                    explored[child] = nodePri+problem.get_cost(child, action)
-                    order += 1
-                    exploredOrder[child] = order
-                    parents[child] = (node, action)
-                    frontier.put(
-                        (nodePri+problem.get_cost(child, action), order, child))
-
-                elif does_exist(frontierlist, child):
-                    if nodePri+problem.get_cost(child, action) < explored[child]:
-
-                        frontier.queue.remove(
-                            (explored[child], exploredOrder[child], child))
-                        frontier.put(
-                            (nodePri+problem.get_cost(child, action), order, child))
-
-                        parents[child] = (node, action)
-
-        # return None
-
-
-def does_exist(flist: list, child_node: S) -> bool:
-    # check
-    for item in flist:
-        if item[2] == child_node:
-            return True
-        else:
-            continue
-    return False
-# end of does_exist function
+    return None
 
 
 def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+    frontier: PriorityFrontier[S] = PriorityFrontier()
+    frontier.push(initial_state, heuristic(problem, initial_state))
+    costs = {initial_state: 0}  # the best known path cost (g) to each state in the frontier or explored
+    parents: Dict[S, Tuple[S, A]] = {}
     explored = set()
-    exploredOrder = {}
-    order = 0
-    pathe = []
-    explored = {}
-    explored[initial_state] = 0
-    exploredOrder[initial_state] = 0
-    frontier = queue.PriorityQueue()
-    frontier.put((0, order, initial_state))
-    parents = {initial_state: ('null', initial_state)}
-    path = []
-    while not frontier.empty():
 
-        dequeued_item = frontier.get()
-        node = dequeued_item[2]
-        nodePri = dequeued_item[0]
+    while frontier:
+        _, node = frontier.pop()
         if problem.is_goal(node):
-            if flag == 0:
-                path.append(node)
-                curr = path[0]
-                parent = parents[curr]
-                prev = parent[0]
-
-                while prev != 'null':
+            return reconstruct_path(parents, node)
+        explored.add(node)
+        cost = costs[node]
+        for action, child, action_cost in problem.expand(node):
+            if child in explored:
+                continue
+            child_cost = cost + action_cost
+            # the heuristic is only computed if the child is new or reached with a cheaper path
+            if child in frontier and costs[child] <= child_cost:
+                continue
+            if frontier.push(child, child_cost + heuristic(problem, child)):
+                costs[child] = child_cost
+                parents[child] = (node, action)
 
-                    path.append(prev)
-                    parent = parents[prev]
-                    prev = parent[0]
-
-                path.reverse()
-                path.pop(0)
-                return path
-
-            else:
-                parent_tuple = parents[node]  # parent of that child
-                parent = parent_tuple[0]
-                actioon = parent_tuple[1]
-                while parent != 'null':
-                    # getting parent of the node called parent "originally was child"
-                    pathe.append(actioon)
-                    # parent is a key tuple and we want it equal to first element only
-                    parent_tuple = parents[parent]
-                    parent = parent_tuple[0]
-                    actioon = parent_tuple[1]
-                # end of while
-
-                pathe.reverse()
-                return pathe
-
-        else:
-
-            for action in problem.get_actions(node):
-
-                child = problem.get_successor(node, action)
-                if child == action:
-                    flag = 0  # graph
-                else:
-                    flag = 1  # dung
-                frontierlist = list(frontier.queue)
-                if child not in explored and not frontier.queue.__contains__(child):
-                    # explored.add(child)
-                    explored[child] = problem.get_cost(
-                        child, action) + heuristic(problem, child)
-                    order += 1
-                    exploredOrder[child] = order
-                    parents[child] = (node, action)
-                    frontier.put(
-                        (heuristic(problem, child)+problem.get_cost(child, action) + heuristic(problem, child), order, child))
-
-                elif does_exist(frontierlist, child):
-                    if (problem.get_cost(child, action) + heuristic(problem, child)) < explored[child]:
-
-                        frontier.queue.remove(
-                            (explored[child], exploredOrder[child], child))
-                        frontier.put(
-                            (problem.get_cost(child, action) + heuristic(problem, child)), order, child)
-
-                        parents[child] = (node, action)
-
-        # return None
-
-
-def does_exist(flist: list, child_node: S) -> bool:
-    # check
-    for item in flist:
-        if item[2] == child_node:
-            return True
-        else:
-            continue
-    return False
-# end of does_exist function
+    return None
 
 
 def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+    frontier: PriorityFrontier[S] = PriorityFrontier()
+    frontier.push(initial_state, heuristic(problem, initial_state))
+    parents: Dict[S, Tuple[S, A]] = {}
     explored = set()
-    exploredOrder = {}
-    order = 0
-    pathe = []
-    explored = {}
-    explored[initial_state] = 0
-    exploredOrder[initial_state] = 0
-    frontier = queue.PriorityQueue()
-    frontier.put((0, order, initial_state))
-    parents = {initial_state: ('null', initial_state)}
 
-    while not frontier.empty():
-
-        dequeued_item = frontier.get()
-        node = dequeued_item[2]
-        nodePri = dequeued_item[0]
+    while frontier:
+        _, node = frontier.pop()
         if problem.is_goal(node):
-            if flag == 0:
-                path = [node]
-                prev = node
-
-                while prev != initial_state:
-                    parent = parents[prev][0]
-                    path.append(parent)
-                    prev = parent
+            return reconstruct_path(parents, node)
+        explored.add(node)
+        for action, child, _ in problem.expand(node):
+            # the priority of a state only depends on the state, so a state in the frontier never needs to be updated
+            if child in explored or child in frontier:
+                continue
+            frontier.push(child, heuristic(problem, child))
+            parents[child] = (node, action)
 
-                path.reverse()
-                path.pop(0)
-                return path
-
-            else:
-                parent_tuple = parents[node]  # parent of that child
-                parent = parent_tuple[0]
-                actioon = parent_tuple[1]
-                while parent != 'null':
-                    # getting parent of the node called parent "originally was child"
-                    pathe.append(actioon)
-                    # parent is a key tuple and we want it equal to first element only
-                    parent_tuple = parents[parent]
-                    parent = parent_tuple[0]
-                    actioon = parent_tuple[1]
-                # end of while
-
-                pathe.reverse()
-                return pathe
-
-        else:
+    return None
 
-            for action in problem.get_actions(node):
 
-                child = problem.get_successor(node, action)
-                if child == action:
-                    flag = 0  # graph
+# Iterative Deepening A* (IDA*) runs depth-first searches bounded by the f-value (g + h), raising the bound
+# to the smallest f-value that exceeded it after each iteration. Its memory only grows with the depth of the path.
+# To avoid exploring the same state many times through different paths, the lowest path cost to each visited state
+# is kept in a transposition table which is cleared every iteration and holds at most 'max_cached_states' states
+# (0 disables it). A state reached again with a higher or equal cost in the same iteration is pruned, since its
+# subtree was already searched with a larger budget.
+def IterativeDeepeningAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, max_cached_states: int = 2**18) -> Solution:
+    bound = heuristic(problem, initial_state)
+    while True:
+        next_bound = float("inf")
+        table: Dict[S, float] = {}
+        path: List[A] = []  # the actions from the initial state to the top of the stack
+        on_path = {initial_state}  # the states in the stack, to avoid cycles
+        if problem.is_goal(initial_state):
+            return path
+        stack = [(initial_state, 0, iter(problem.expand(initial_state)))]
+        while stack:
+            node, cost, expansions = stack[-1]
+            expansion = next(expansions, _EXHAUSTED)
+            if expansion is _EXHAUSTED:
+                stack.pop()
+                on_path.discard(node)
+                if stack: path.pop()
+                continue
+            action, child, action_cost = expansion
+            if child in on_path:
+                continue
+            child_cost = cost + action_cost
+            best_cost = table.get(child)
+            if best_cost is not None and best_cost <= child_cost:
+                continue
+            f = child_cost + heuristic(problem, child)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if best_cost is not None or len(table) < max_cached_states:
+                table[child] = child_cost
+            path.append(action)
+            if problem.is_goal(child):
+                return path
+            on_path.add(child)
+            stack.append((child, child_cost, iter(problem.expand(child))))
+        if next_bound == float("inf"):
+            return None
+        bound = next_bound
+
+
+# Recursive Best First Search (RBFS) mimics A* using memory linear in the depth of the path.
+# It follows the best child as long as its f-value does not exceed the best alternative found elsewhere,
+# then it forgets the subtree and only remembers its best f-value, which is backed up to its root.
+# It trades memory for time since the forgotten subtrees are expanded again when they become the best alternative.
+def RecursiveBestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+    on_path = {initial_state}  # the states on the current path, to avoid cycles
+    path: List[A] = []
+
+    # Returns whether the goal was found under the state, and the backed up f-value of the state
+    def search(state: S, cost: float, f: float, f_limit: float) -> Tuple[bool, float]:
+        if problem.is_goal(state):
+            return True, f
+        children = []  # [f, order, child, action, child cost]
+        for order, (action, child, action_cost) in enumerate(problem.expand(state)):
+            if child in on_path:
+                continue
+            child_cost = cost + action_cost
+            # The f-value of a child is at least that of its parent (which may be a backed up value)
+            children.append([max(child_cost + heuristic(problem, child), f), order, child, action, child_cost])
+        if not children:
+            return False, float("inf")
+        while True:
+            children.sort(key=lambda item: (item[0], item[1]))  # ties are broken by the order of the actions
+            best = children[0]
+            # Stop if the best child exceeds the limit or every child is a dead end (inf > inf is False)
+            if best[0] > f_limit or best[0] == float("inf"):
+                return False, best[0]
+            alternative = children[1][0] if len(children) > 1 else float("inf")
+            _, _, child, action, child_cost = best
+            on_path.add(child)
+            path.append(action)
+            found, best[0] = search(child, child_cost, best[0], min(f_limit, alternative))
+            if found:
+                return True, best[0]
+            path.pop()
+            on_path.discard(child)
+
+    found, _ = search(initial_state, 0, heuristic(problem, initial_state), float("inf"))
+    return path if found else None
+
+
+# The anytime searches return a first solution quickly then improve it as long as their time budget allows.
+# Whenever they find a better solution, they call 'on_solution(solution, cost, bound)' (if given) where 'bound' is
+# the suboptimality bound of the solution: its cost is at most 'bound' times the optimal cost (if the heuristic is admissible).
+# If the time budget ('time_limit' in seconds, None for no limit) runs out, they return the best solution found so far (or None).
+SolutionListener = Callable[[List[A], float, float], None]
+
+
+# Anytime Repairing A* (ARA*) runs a series of weighted A* searches (with f = g + weight * h) with decreasing weights,
+# reusing the work of the previous searches: only the states whose cost improved since they were expanded (the inconsistent
+# states) are expanded again. Each search stops as soon as no state in the frontier can improve the best solution.
+# The cost of the solution of a search with the weight w is at most w times the optimal cost if the heuristic is consistent,
+# and the bound reported is the tighter of w and the cost divided by the lowest g + h of the states not expanded yet.
+# The last search (with the weight 1) returns an optimal solution.
+def AnytimeRepairingAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                                weight: float = 3.0, weight_step: float = 0.5, time_limit: Optional[float] = None,
+                                on_solution: Optional[SolutionListener] = None) -> Solution:
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    if problem.is_goal(initial_state):
+        if on_solution is not None: on_solution([], 0, 1)
+        return []
+    heuristics: Dict[S, float] = {}  # the heuristic is computed once per state since the priorities are recomputed for each weight
+    def h(state: S) -> float:
+        value = heuristics.get(state)
+        if value is None:
+            value = heuristics[state] = heuristic(problem, state)
+        return value
+
+    costs = {initial_state: 0}
+    parents: Dict[S, Tuple[S, A]] = {}
+    frontier: PriorityFrontier[S] = PriorityFrontier()
+    frontier.push(initial_state, weight * h(initial_state))
+    explored, inconsistent = set(), set()
+    best, best_cost, best_goal = None, float("inf"), None
+    reported = (float("inf"), float("inf"))  # the cost and the bound of the last reported solution
+
+    while True:
+        # Expand the states until no state in the frontier can lead to a cheaper goal with the current weight
+        while frontier and frontier.peek()[0] < best_cost:
+            if deadline is not None and time.perf_counter() > deadline:
+                return best
+            _, node = frontier.pop()
+            explored.add(node)
+            cost = costs[node]
+            for action, child, action_cost in problem.expand(node):
+                child_cost = cost + action_cost
+                if child_cost >= costs.get(child, float("inf")):
+                    continue
+                costs[child] = child_cost
+                parents[child] = (node, action)
+                # The goals are not expanded, the search only keeps the cheapest one
+                if problem.is_goal(child):
+                    if child_cost < best_cost:
+                        best_cost, best_goal = child_cost, child
+                elif child in explored:
+                    # It will be expanded again by the next search (with a lower weight)
+                    inconsistent.add(child)
                 else:
-                    flag = 1  # dung
-                frontierlist = list(frontier.queue)
-                if child not in explored:
-                    # explored.add(child)
-                    explored[child] = problem.get_cost(
-                        child, node)+heuristic(problem, child)
-                    order += 1
-                    exploredOrder[child] = order
+                    frontier.push(child, child_cost + weight * h(child))
+        if best_goal is None:
+            return None
+        # The optimal cost is at least the lowest g + h of the states that were not expanded (with the current costs)
+        lower_bound = min([best_cost] + [costs[state] + h(state) for state in frontier.priorities] + [costs[state] + h(state) for state in inconsistent])
+        bound = min(weight, best_cost / lower_bound) if lower_bound > 0 else (1 if best_cost == 0 else weight)
+        best = reconstruct_path(parents, best_goal)
+        # The solution is only reported if its cost or its bound improved
+        if on_solution is not None and (best_cost < reported[0] or bound < reported[1]):
+            on_solution(best, best_cost, bound)
+            reported = (best_cost, bound)
+        if weight <= 1 or bound <= 1:
+            return best
+        # Start the next search with a lower weight from the frontier and the inconsistent states
+        weight = max(1, weight - weight_step)
+        states = list(frontier.priorities) + list(inconsistent)
+        frontier = PriorityFrontier()
+        for state in states:
+            frontier.push(state, costs[state] + weight * h(state))
+        explored, inconsistent = set(), set()
+
+
+# Beam search is a breadth first search that only keeps the 'beam_width' best states (with the lowest g + h) of each level,
+# so its memory and time are linear in the depth of the solution, but it may return a worse solution or none at all.
+# If a time budget is given, the search is restarted with a doubled beam width after each run (until the time runs out
+# or a run does not drop any state), keeping the best solution. The only known lower bound on the optimal cost is the
+# heuristic of the initial state, so the reported bound is the cost divided by it (infinite if it is 0).
+def BeamSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+               beam_width: int = 64, time_limit: Optional[float] = None,
+               on_solution: Optional[SolutionListener] = None) -> Solution:
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    if problem.is_goal(initial_state):
+        if on_solution is not None: on_solution([], 0, 1)
+        return []
+    lower_bound = heuristic(problem, initial_state)
+    best, best_cost = None, float("inf")
+    while True:
+        costs = {initial_state: 0}
+        parents: Dict[S, Tuple[S, A]] = {}
+        level = [initial_state]
+        pruned, timed_out = False, False
+        goal, goal_cost = None, float("inf")
+        while level and goal is None:
+            candidates = []  # (f, order, child) of the next level
+            for node in level:
+                if deadline is not None and time.perf_counter() > deadline:
+                    timed_out = True
+                    break
+                cost = costs[node]
+                for action, child, action_cost in problem.expand(node):
+                    child_cost = cost + action_cost
+                    if child_cost >= costs.get(child, float("inf")):
+                        continue
+                    costs[child] = child_cost
                     parents[child] = (node, action)
-                    frontier.put(
-                        (problem.get_cost(child, node)+heuristic(problem, child), order, child))
-
-                elif does_exist(frontierlist, child):
-                    if problem.get_cost(child, node)+heuristic(problem, child) < explored[child]:
-
-                        frontier.queue.remove(
-                            (explored[child], exploredOrder[child], child))
-                        frontier.put(
-                            (problem.get_cost(child, node)+heuristic(problem, child), order, child))
-
-                        parents[child] = (node, action)
+                    # The goal test is done when the child is generated, and the cheapest goal of the level is kept
+                    if problem.is_goal(child):
+                        if child_cost < goal_cost:
+                            goal, goal_cost = child, child_cost
+                        continue
+                    candidates.append((child_cost + heuristic(problem, child), len(candidates), child))
+            if timed_out:
+                break
+            if len(candidates) > beam_width:
+                pruned = True
+                candidates = heapq.nsmallest(beam_width, candidates)
+            # A state may appear more than once if it was reached again with a lower cost
+            level = list(dict.fromkeys(child for _, _, child in candidates))
+        if goal is not None and goal_cost < best_cost:
+            best, best_cost = reconstruct_path(parents, goal), goal_cost
+            bound = best_cost / lower_bound if lower_bound > 0 else (1 if best_cost == 0 else float("inf"))
+            if on_solution is not None: on_solution(best, best_cost, bound)
+        if deadline is None or timed_out or not pruned or time.perf_counter() > deadline:
+            return best
+        beam_width *= 2
+
+
+# The bidirectional searches run one search forward from the initial state and one backward from the goal until they meet.
+# They require a problem with a single goal state ('problem.goal') that can list the predecessors of a state
+# as (predecessor, action) pairs with 'problem.get_predecessors(state)' (e.g. GraphRoutingProblem).
+
+# Bidirectional BFS finds the path with the fewest actions. It expands a whole level of the smaller frontier at a time,
+# and once the frontiers meet, it finishes the level to pick the shortest of the paths that meet in it.
+def BidirectionalBreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+    goal = problem.goal
+    if problem.is_goal(initial_state):
+        return []
+    forward_frontier, backward_frontier = [initial_state], [goal]
+    forward_depths, backward_depths = {initial_state: 0}, {goal: 0}
+    forward_parents: Dict[S, Tuple[S, A]] = {}  # state -> (previous state, action from the previous state)
+    backward_parents: Dict[S, Tuple[S, A]] = {}  # state -> (next state, action to the next state)
+
+    while forward_frontier and backward_frontier:
+        forward = len(forward_frontier) <= len(backward_frontier)
+        frontier = forward_frontier if forward else backward_frontier
+        depths, other_depths = (forward_depths, backward_depths) if forward else (backward_depths, forward_depths)
+        parents = forward_parents if forward else backward_parents
+        next_frontier = []
+        best_length, meeting = float("inf"), None
+        for node in frontier:
+            if forward:
+                neighbors = ((child, action) for action, child, _ in problem.expand(node))
+            else:
+                neighbors = problem.get_predecessors(node)
+            for child, action in neighbors:
+                if child in depths:
+                    continue
+                depths[child] = depths[node] + 1
+                parents[child] = (node, action)
+                next_frontier.append(child)
+                if child in other_depths and depths[child] + other_depths[child] < best_length:
+                    best_length, meeting = depths[child] + other_depths[child], child
+        if meeting is not None:
+            return join_paths(forward_parents, backward_parents, meeting)
+        if forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
 
-        # return None
+    return None
 
 
-def does_exist(flist: list, child_node: S) -> bool:
-    # check
-    for item in flist:
-        if item[2] == child_node:
-            return True
+# Bidirectional A* alternates between a forward and a backward A* and keeps the cheapest path found where they meet.
+# To make both searches agree, they use the average potential p(s) = h(s)/2 (forward) and -h(s)/2 (backward),
+# which is consistent in both directions if the heuristic is consistent.
+# Each search stops when the sum of the lowest priorities of both frontiers reaches the cost of the best path found.
+# With the zero heuristic, this is bidirectional Dijkstra (see BidirectionalUniformCostSearch).
+def BidirectionalAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+    goal = problem.goal
+    if problem.is_goal(initial_state):
+        return []
+    potentials: Dict[S, float] = {}
+    def potential(state: S) -> float:
+        value = potentials.get(state)
+        if value is None:
+            value = potentials[state] = heuristic(problem, state) / 2
+        return value
+
+    frontiers: List[PriorityFrontier[S]] = [PriorityFrontier(), PriorityFrontier()]
+    costs: List[Dict[S, float]] = [{initial_state: 0}, {goal: 0}]
+    parents: List[Dict[S, Tuple[S, A]]] = [{}, {}]
+    explored: List[set] = [set(), set()]
+    frontiers[0].push(initial_state, potential(initial_state))
+    frontiers[1].push(goal, -potential(goal))
+    best_cost, meeting = float("inf"), None
+
+    while frontiers[0] and frontiers[1]:
+        if frontiers[0].peek()[0] + frontiers[1].peek()[0] >= best_cost:
+            break
+        # Expand the side with the smaller frontier
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        sign = 1 if side == 0 else -1
+        frontier, cost_map, other_costs = frontiers[side], costs[side], costs[1 - side]
+        _, node = frontier.pop()
+        explored[side].add(node)
+        cost = cost_map[node]
+        if side == 0:
+            neighbors = problem.expand(node)
         else:
-            continue
-    return False
-# end of does_exist function
+            # The action goes from child to node in the backward search
+            neighbors = ((action, child, problem.get_cost(child, action)) for child, action in problem.get_predecessors(node))
+        for action, child, action_cost in neighbors:
+            if child in explored[side]:
+                continue
+            child_cost = cost + action_cost
+            if child in frontier and cost_map[child] <= child_cost:
+                continue
+            if frontier.push(child, child_cost + sign * potential(child)):
+                cost_map[child] = child_cost
+                parents[side][child] = (node, action)
+                if child in other_costs and child_cost + other_costs[child] < best_cost:
+                    best_cost, meeting = child_cost + other_costs[child], child
+
+    return None if meeting is None else join_paths(parents[0], parents[1], meeting)
+
+
+def BidirectionalUniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+    return BidirectionalAStarSearch(problem, initial_state, lambda *_: 0)
+
+
+# Joins the path from the initial state to the meeting state (found by the forward search)
+# with the path from the meeting state to the goal (found by the backward search)
+def join_paths(forward_parents: Dict[S, Tuple[S, A]], backward_parents: Dict[S, Tuple[S, A]], meeting: S) -> List[A]:
+    path = reconstruct_path(forward_parents, meeting)
+    state = meeting
+    while state in backward_parents:
+        state, action = backward_parents[state]
+        path.append(action)
+    return path
+
+
+# A sentinel returned by next() when an iterator is exhausted (distinct from any item of the iterator)
+_EXHAUSTED = object()
+
+
+# A priority queue of states implemented with a binary heap (heapq).
+# Each state has a single live entry: pushing a state with a better priority adds a new entry, and the old entry
+# becomes stale and is skipped when it is popped (lazy deletion), instead of searching the heap to remove it.
+# The ties are broken by the insertion order (first in, first out), so the searches are deterministic.
+class PriorityFrontier(Generic[S]):
+    def __init__(self) -> None:
+        self.heap: List[Tuple[float, int, S]] = []
+        self.priorities: Dict[S, float] = {}  # the priority of the live entry of each state in the frontier
+        self.counter = count()
+
+    # Adds the state or, if it is already in the frontier, lowers its priority.
+    # Returns False (and does nothing) if the state is already in the frontier with a lower or equal priority.
+    def push(self, state: S, priority: float) -> bool:
+        current = self.priorities.get(state)
+        if current is not None and current <= priority:
+            return False
+        self.priorities[state] = priority
+        heapq.heappush(self.heap, (priority, next(self.counter), state))
+        return True
+
+    # Removes and returns the (priority, state) with the lowest priority
+    def pop(self) -> Tuple[float, S]:
+        heap, priorities = self.heap, self.priorities
+        while heap:
+            priority, _, state = heapq.heappop(heap)
+            if priorities.get(state) == priority:
+                del priorities[state]
+                return priority, state
+        raise IndexError("pop from an empty frontier")
+
+    # Returns the (priority, state) with the lowest priority without removing it
+    def peek(self) -> Tuple[float, S]:
+        heap, priorities = self.heap, self.priorities
+        while heap:
+            priority, _, state = heap[0]
+            if priorities.get(state) == priority:
+                return priority, state
+            heapq.heappop(heap)
+        raise IndexError("peek into an empty frontier")
+
+    def __contains__(self, state: S) -> bool:
+        return state in self.priorities
+
+    def __len__(self) -> int:
+        return len(self.priorities)
+
+
+# Follows the parents from the given state back to the initial state (which has no parent)
+# and returns the actions that lead from the initial state to the given state
+def reconstruct_path(parents: Dict[S, Tuple[S, A]], state: S) -> List[A]:
+    path = []
+    while state in parents:
+        state, action = parents[state]
+        path.append(action)
+    path.reverse()
+    return path
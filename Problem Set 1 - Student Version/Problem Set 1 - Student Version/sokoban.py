@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 from enum import Enum
+import random
 
 from mathutils import Direction, Point
 from problem import Problem
-from helpers.utils import track_call_count
+from helpers.utils import memoize_by_file, track_call_count
 
 # This file contains the definition for the Sokoban problem
 # In this problem, the agent can move Up, Down, Left or Right
@@ -73,6 +74,8 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
     layout: SokobanLayout
     initial_state: SokobanState
+    # If True, get_actions skips the pushes that lead to deadlocks (states from which the goal cannot be reached)
+    prune_deadlocks: bool = False
 
     def get_initial_state(self) -> SokobanState:
         return self.initial_state
@@ -84,19 +87,52 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
         actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
+        crates = state.crates
+        for direction, position, crate_position in self.get_steps()[state.player]:
             # Disallow walking into walls
-            if position not in self.layout.walkable: continue
+            if position is None: continue
             # Check if walking into a crate
-            if position in state.crates:
+            if position in crates:
                 # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
-                if crate_position not in self.layout.walkable or crate_position in state.crates:
+                if crate_position is None or crate_position in crates:
+                    continue
+                # If enabled, skip the pushes that lead to a deadlock
+                if self.prune_deadlocks and self.is_deadlocked_push(state, position, crate_position):
                     continue
             actions.append(direction)
         return actions
 
+    # Returns the steps from every walkable position: steps[position][direction] is (direction, next position, the position after it)
+    # where the positions that are walls are None. They only depend on the layout, so they are computed once and stored in the cache.
+    def get_steps(self) -> Dict[Point, List[Tuple[Direction, Optional[Point], Optional[Point]]]]:
+        steps = self.cache().get("steps")
+        if steps is None:
+            walkable = self.layout.walkable
+            steps = self.cache()["steps"] = {}
+            for position in walkable:
+                steps[position] = []
+                for direction in Direction:
+                    vector = direction.to_vector()
+                    next_position = position + vector
+                    after = next_position + vector
+                    steps[position].append((direction, next_position if next_position in walkable else None, after if after in walkable else None))
+        return steps
+
+    # Returns whether pushing the crate at the given position (where the player will be) to 'crate_position' leads to a deadlock
+    def is_deadlocked_push(self, state: SokobanState, position: Point, crate_position: Point) -> bool:
+        deadlocks = self.get_deadlocks()
+        indices = deadlocks.cells.indices
+        crates = deadlocks.cells.encode_positions(state.crates) ^ (1 << indices[position]) ^ (1 << indices[crate_position])
+        return deadlocks.is_deadlock(indices[position], crates, indices[crate_position])
+
+    # Returns the deadlock detection of the layout (see sokoban_deadlocks.py), which is computed once and stored in the cache
+    def get_deadlocks(self) -> 'SokobanDeadlocks':
+        deadlocks = self.cache().get("deadlocks")
+        if deadlocks is None:
+            from sokoban_deadlocks import SokobanDeadlocks
+            deadlocks = self.cache()["deadlocks"] = SokobanDeadlocks(SokobanCells(self.layout))
+        return deadlocks
+
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
         player = state.player + action.to_vector()
         crates = state.crates
@@ -116,9 +152,23 @@ class SokobanProblem(Problem[SokobanState, Direction]):
         # All actions have the same cost
         return 1
 
+    # Returns the (action, next state, cost) of every possible action in the order of get_actions.
+    # The actions returned by get_actions are valid, so the player (and the pushed crate) are moved without checking them again.
+    def expand(self, state: SokobanState) -> List[Tuple[Direction, SokobanState, float]]:
+        layout, crates = self.layout, state.crates
+        steps = self.get_steps()[state.player]
+        expansions = []
+        for action in self.get_actions(state):
+            _, position, crate_position = steps[action]
+            if position in crates:
+                expansions.append((action, SokobanState(layout, position, crates.symmetric_difference((position, crate_position))), 1))
+            else:
+                expansions.append((action, SokobanState(layout, position, crates), 1))
+        return expansions
+
     # Read a sokoban problem from text containing a grid of tiles
     @staticmethod
-    def from_text(text: str) -> 'SokobanProblem':
+    def from_text(text: str, prune_deadlocks: bool = False) -> 'SokobanProblem':
         walkable, crates, goals =  set(), set(), set()
         player: Point = None
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
@@ -140,12 +190,199 @@ class SokobanProblem(Problem[SokobanState, Direction]):
                         crates.add(Point(x, y))
                         goals.add(Point(x, y))
         problem = SokobanProblem()
+        problem.prune_deadlocks = prune_deadlocks
         problem.layout = SokobanLayout(width, height, frozenset(walkable), frozenset(goals))
         problem.initial_state = SokobanState(problem.layout, player, frozenset(crates))
         return problem
 
     # Read a sokoban problem from file containing a grid of tiles
+    # The problem is memoized by path (until the file is modified) since it is never modified after loading
     @staticmethod
-    def from_file(path: str) -> 'SokobanProblem':
+    @memoize_by_file
+    def from_file(path: str, prune_deadlocks: bool = False) -> 'SokobanProblem':
         with open(path, 'r') as f:
-            return SokobanProblem.from_text(f.read())
\ No newline at end of file
+            return SokobanProblem.from_text(f.read(), prune_deadlocks)
+
+# The compact encoding of the sokoban problem numbers the walkable cells of the layout,
+# so a state is the index of the player cell and a bitmask of the crate cells (bit i is set if cell i has a crate).
+# Compared to SokobanState, a state is a few machine words instead of a frozenset of Points,
+# and the moves are looked up in precomputed tables instead of adding Points and hashing them.
+
+# The cells of a sokoban layout:
+#   'positions[i]' is the position of cell i and 'indices' maps each position back to its index
+#   'neighbors[direction][i]' is the index of the cell next to cell i in the direction (or -1 if it is a wall)
+#   'moves' pairs each direction with its neighbors table (iterating over the Direction enum is slow)
+#   'goals' is the bitmask of the goal cells
+#   'crate_keys[i]' and 'player_keys[i]' are the random keys used to hash a crate or the player at cell i (Zobrist hashing),
+#   so the hash of a state can be updated incrementally by XORing the keys of the cells that changed
+class SokobanCells:
+    def __init__(self, layout: SokobanLayout) -> None:
+        self.layout = layout
+        # The cells are sorted in row-major order so the encoding is the same for the same layout
+        self.positions: List[Point] = sorted(layout.walkable, key=lambda position: (position.y, position.x))
+        self.indices: Dict[Point, int] = {position: index for index, position in enumerate(self.positions)}
+        self.neighbors: List[List[int]] = [
+            [self.indices.get(position + direction.to_vector(), -1) for position in self.positions]
+            for direction in Direction
+        ]
+        self.moves = list(zip(Direction, self.neighbors))
+        self.goals = self.encode_positions(layout.goals)
+        rng = random.Random(len(self.positions)) # The keys are seeded so the hashes are reproducible
+        self.crate_keys = [rng.getrandbits(64) for _ in self.positions]
+        self.player_keys = [rng.getrandbits(64) for _ in self.positions]
+
+    def encode_positions(self, positions: Iterable[Point]) -> int:
+        mask = 0
+        for position in positions: mask |= 1 << self.indices[position]
+        return mask
+
+    # Returns the indices of the cells in the bitmask
+    @staticmethod
+    def decode_cells(mask: int) -> Iterator[int]:
+        while mask:
+            lowest = mask & -mask
+            yield lowest.bit_length() - 1
+            mask ^= lowest
+
+    def encode(self, state: SokobanState) -> 'CompactSokobanState':
+        player, crates = self.indices[state.player], self.encode_positions(state.crates)
+        key = self.player_keys[player]
+        for cell in self.decode_cells(crates): key ^= self.crate_keys[cell]
+        return CompactSokobanState(self, player, crates, key)
+
+    def decode(self, state: 'CompactSokobanState') -> SokobanState:
+        return SokobanState(self.layout, self.positions[state.player], frozenset(self.positions[cell] for cell in self.decode_cells(state.crates)))
+
+# A sokoban state in the compact encoding. It is immutable (its fields must not be modified after it is created).
+# 'key' is the Zobrist hash of the state which is computed incrementally from the parent state,
+# so hashing the state is free and equality is only checked on hash collisions.
+class CompactSokobanState:
+    __slots__ = ("cells", "player", "crates", "key")
+
+    def __init__(self, cells: SokobanCells, player: int, crates: int, key: int) -> None:
+        self.cells = cells
+        self.player = player
+        self.crates = crates
+        self.key = key
+
+    def __hash__(self) -> int:
+        return self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CompactSokobanState) and self.player == other.player and self.crates == other.crates
+
+    def __str__(self) -> str:
+        return str(self.cells.decode(self))
+
+# This is the sokoban problem with the compact state encoding.
+# It has the same actions and costs as SokobanProblem, so the searches find the same solutions.
+class CompactSokobanProblem(Problem[CompactSokobanState, Direction]):
+    cells: SokobanCells
+    initial_state: CompactSokobanState
+    # If True, get_actions skips the pushes that lead to deadlocks (states from which the goal cannot be reached)
+    prune_deadlocks: bool = False
+
+    def get_initial_state(self) -> CompactSokobanState:
+        return self.initial_state
+
+    def is_goal(self, state: CompactSokobanState) -> bool:
+        return state.crates == self.cells.goals
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: CompactSokobanState) -> Iterable[Direction]:
+        actions = []
+        player, crates = state.player, state.crates
+        for direction, neighbors in self.cells.moves:
+            position = neighbors[player]
+            # Disallow walking into walls
+            if position < 0: continue
+            # If walking into a crate, make sure that the crate is not pushed into a wall or another crate
+            if crates >> position & 1:
+                crate_position = neighbors[position]
+                if crate_position < 0 or crates >> crate_position & 1: continue
+                # If enabled, skip the pushes that lead to a deadlock
+                if self.prune_deadlocks and self.get_deadlocks().is_deadlock(position, crates ^ (1 << position) ^ (1 << crate_position), crate_position):
+                    continue
+            actions.append(direction)
+        return actions
+
+    # Returns the deadlock detection of the layout (see sokoban_deadlocks.py), which is computed once and stored in the cache
+    def get_deadlocks(self) -> 'SokobanDeadlocks':
+        deadlocks = self.cache().get("deadlocks")
+        if deadlocks is None:
+            from sokoban_deadlocks import SokobanDeadlocks
+            deadlocks = self.cache()["deadlocks"] = SokobanDeadlocks(self.cells)
+        return deadlocks
+
+    def get_successor(self, state: CompactSokobanState, action: Direction) -> CompactSokobanState:
+        cells = self.cells
+        neighbors = cells.neighbors[action]
+        player, crates = neighbors[state.player], state.crates
+        if player < 0:
+            # If we try to walk into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        key = state.key ^ cells.player_keys[state.player] ^ cells.player_keys[player]
+        if crates >> player & 1:
+            crate_position = neighbors[player]
+            if crate_position < 0 or crates >> crate_position & 1:
+                # If we try to push a crate into a wall or another crate, then this action is wrong
+                raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+            # If we walk to a crate, we push it
+            crates ^= (1 << player) | (1 << crate_position)
+            key ^= cells.crate_keys[player] ^ cells.crate_keys[crate_position]
+        return CompactSokobanState(cells, player, crates, key)
+
+    def get_cost(self, state: CompactSokobanState, action: Direction) -> float:
+        # All actions have the same cost
+        return 1
+
+    # Returns the (action, next state, cost) of every possible action in the order of get_actions,
+    # updating the hash of the state like get_successor but without checking the actions again
+    def expand(self, state: CompactSokobanState) -> List[Tuple[Direction, CompactSokobanState, float]]:
+        cells = self.cells
+        neighbors, player_keys, crate_keys = cells.neighbors, cells.player_keys, cells.crate_keys
+        player, crates = state.player, state.crates
+        key = state.key ^ player_keys[player]
+        expansions = []
+        for action in self.get_actions(state):
+            table = neighbors[action]
+            position = table[player]
+            if crates >> position & 1:
+                crate_position = table[position]
+                next_state = CompactSokobanState(cells, position, crates ^ (1 << position) ^ (1 << crate_position),
+                                                 key ^ player_keys[position] ^ crate_keys[position] ^ crate_keys[crate_position])
+            else:
+                next_state = CompactSokobanState(cells, position, crates, key ^ player_keys[position])
+            expansions.append((action, next_state, 1))
+        return expansions
+
+    # Converts a sokoban problem to the compact encoding
+    @staticmethod
+    def from_problem(problem: SokobanProblem) -> 'CompactSokobanProblem':
+        compact = CompactSokobanProblem()
+        compact.prune_deadlocks = problem.prune_deadlocks
+        compact.cells = SokobanCells(problem.layout)
+        compact.initial_state = compact.cells.encode(problem.initial_state)
+        return compact
+
+    # Read a sokoban problem from file containing a grid of tiles
+    # The problem is memoized by path (until the file is modified) since it is never modified after loading
+    @staticmethod
+    @memoize_by_file
+    def from_file(path: str, prune_deadlocks: bool = False) -> 'CompactSokobanProblem':
+        with open(path, 'r') as f:
+            return CompactSokobanProblem.from_problem(SokobanProblem.from_text(f.read(), prune_deadlocks))
+
+# Adapts a heuristic written for SokobanProblem (that reads the player and crate positions) to CompactSokobanProblem.
+# The heuristic receives the decoded state and a SokobanProblem with the same layout (which shares the compact problem cache).
+def compact_heuristic(heuristic):
+    def adapted(problem: CompactSokobanProblem, state: CompactSokobanState) -> float:
+        original = problem.cache().get("original_problem")
+        if original is None:
+            original = problem.cache()["original_problem"] = SokobanProblem()
+            original.layout = problem.cells.layout
+            original.initial_state = problem.cells.decode(problem.initial_state)
+            original._cache = problem.cache()
+        return heuristic(original, problem.cells.decode(state))
+    return adapted
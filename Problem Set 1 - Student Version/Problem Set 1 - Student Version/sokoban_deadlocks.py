@@ -0,0 +1,160 @@
+from typing import Dict, List, Tuple
+from collections import deque
+
+from sokoban import SokobanCells
+
+# This file contains the deadlock detection for the sokoban problem.
+# A deadlock is a state from which the goal cannot be reached whatever the player does,
+# so the search can prune it (and everything under it) without losing any solution.
+# All the checks work on the compact encoding of the cells (see SokobanCells) where sets of cells are bitmasks.
+# Three kinds of deadlocks are detected after each push:
+#   1. Dead squares: the cells from which a crate can never be pushed to any goal (e.g. corners and most cells along walls).
+#      They only depend on the layout so they are precomputed.
+#   2. Frozen crates: a crate that can no longer move (it is blocked on both axes by walls, dead squares or other frozen crates)
+#      while it is not on a goal.
+#   3. Corral deadlocks: the push closes an area (a corral) that the player cannot reach. The crates around the corral are
+#      checked with a small push-level search where the other crates are removed. If even this easier problem cannot put
+#      these crates on goals or let the player into the corral, the state is a deadlock.
+
+class SokobanDeadlocks:
+    # 'corral_limit' is the maximum number of states explored by the search of a corral.
+    # If it is reached, the corral is assumed to be solvable (so no solution is ever pruned).
+    def __init__(self, cells: SokobanCells, corral_limit: int = 512) -> None:
+        self.cells = cells
+        self.corral_limit = corral_limit
+        self.dead_squares = self._find_dead_squares()
+        # The results of the corral searches by (crates around the corral, player cell, corral area).
+        # The area is part of the key since the same crates can close different areas (and only reaching the area succeeds).
+        self.corral_results: Dict[Tuple[int, int, int], bool] = {}
+
+    # A crate can reach a goal if it can be pulled from the goal to its cell (the reverse of pushing).
+    # A crate at cell c can be pulled to the next cell n in some direction if the cell after n is free for the player.
+    def _find_dead_squares(self) -> int:
+        neighbors = self.cells.neighbors
+        live = self.cells.goals
+        queue = deque(SokobanCells.decode_cells(live))
+        while queue:
+            cell = queue.popleft()
+            for table in neighbors:
+                next_cell = table[cell]
+                if next_cell < 0 or live >> next_cell & 1: continue
+                if table[next_cell] < 0: continue
+                live |= 1 << next_cell
+                queue.append(next_cell)
+        return ((1 << len(self.cells.positions)) - 1) & ~live
+
+    # Returns the bitmask of the cells that the player can walk to (without pushing any crate)
+    def reachable(self, player: int, crates: int) -> int:
+        neighbors = self.cells.neighbors
+        region = 1 << player
+        stack = [player]
+        while stack:
+            cell = stack.pop()
+            for table in neighbors:
+                next_cell = table[cell]
+                if next_cell < 0: continue
+                bit = 1 << next_cell
+                if region & bit or crates & bit: continue
+                region |= bit
+                stack.append(next_cell)
+        return region
+
+    # Returns whether the crate at the given cell can never be moved again and the crates found frozen on the way.
+    # The crates in 'walls' are treated as walls (to avoid checking the same crate again).
+    def _is_frozen(self, cell: int, crates: int, walls: int, frozen: List[int]) -> bool:
+        neighbors = self.cells.neighbors
+        walls |= 1 << cell
+        # Check the horizontal axis (RIGHT, LEFT) then the vertical axis (UP, DOWN)
+        for first, second in ((0, 2), (1, 3)):
+            blocked = False
+            sides = (neighbors[first][cell], neighbors[second][cell])
+            # Blocked by a wall (or a crate treated as a wall) on either side
+            if any(side < 0 or walls >> side & 1 for side in sides):
+                blocked = True
+            # Blocked if it can only be pushed to dead squares along this axis
+            elif all(self.dead_squares >> side & 1 for side in sides):
+                blocked = True
+            # Blocked by a frozen crate on either side
+            else:
+                for side in sides:
+                    if crates >> side & 1 and self._is_frozen(side, crates, walls, frozen):
+                        blocked = True
+                        break
+            if not blocked: return False
+        frozen.append(cell)
+        return True
+
+    # Returns whether pushing a crate to the given cell creates a frozen crate that is not on a goal
+    def is_frozen_deadlock(self, crates: int, pushed: int) -> bool:
+        frozen: List[int] = []
+        if not self._is_frozen(pushed, crates, 0, frozen): return False
+        goals = self.cells.goals
+        return any(not goals >> cell & 1 for cell in frozen)
+
+    # Returns whether the state reached by pushing a crate to 'pushed' (the player is now at 'player') is a deadlock
+    def is_deadlock(self, player: int, crates: int, pushed: int) -> bool:
+        if self.dead_squares >> pushed & 1: return True
+        if self.is_frozen_deadlock(crates, pushed): return True
+        return self.is_corral_deadlock(player, crates, pushed)
+
+    # Checks the corrals next to the pushed crate (the areas that the player cannot reach)
+    def is_corral_deadlock(self, player: int, crates: int, pushed: int) -> bool:
+        neighbors = self.cells.neighbors
+        region = self.reachable(player, crates)
+        checked = region | crates
+        for table in neighbors:
+            cell = table[pushed]
+            if cell < 0 or checked >> cell & 1: continue
+            # The corral is the area around the cell that the player cannot reach, and its crates are the crates next to it
+            area = self.reachable(cell, crates)
+            checked |= area
+            corral_crates = 0
+            for area_cell in SokobanCells.decode_cells(area):
+                for other in neighbors:
+                    next_cell = other[area_cell]
+                    if next_cell >= 0 and crates >> next_cell & 1: corral_crates |= 1 << next_cell
+            if self._is_unsolvable_corral(player, corral_crates, area): return True
+        return False
+
+    # Runs a push-level breadth first search where only the crates of the corral exist.
+    # It succeeds if every crate is on a goal or the player reaches the corral area.
+    # Returns True only if the search explored every state without success.
+    def _is_unsolvable_corral(self, player: int, crates: int, area: int) -> bool:
+        goals = self.cells.goals
+        if crates & ~goals == 0: return False
+        key = (crates, player, area)
+        result = self.corral_results.get(key)
+        if result is not None: return result
+        neighbors = self.cells.neighbors
+        region = self.reachable(player, crates)
+        # The states are identified by the crates and the lowest cell reachable by the player
+        start = (crates, (region & -region).bit_length())
+        seen = {start}
+        queue = deque([(crates, region)])
+        result = True
+        while queue and result:
+            if len(seen) > self.corral_limit:
+                result = False
+                break
+            crates, region = queue.popleft()
+            for cell in SokobanCells.decode_cells(region):
+                for table in neighbors:
+                    crate = table[cell]
+                    if crate < 0 or not crates >> crate & 1: continue
+                    target = table[crate]
+                    if target < 0 or crates >> target & 1 or self.dead_squares >> target & 1: continue
+                    next_crates = crates ^ (1 << crate) ^ (1 << target)
+                    if self.is_frozen_deadlock(next_crates, target): continue
+                    next_region = self.reachable(crate, next_crates)
+                    if next_crates & ~goals == 0 or next_region & area:
+                        result = False
+                        break
+                    state = (next_crates, (next_region & -next_region).bit_length())
+                    if state in seen: continue
+                    seen.add(state)
+                    queue.append((next_crates, next_region))
+                if not result: break
+        # The results are kept for the states seen again (bounded to avoid growing without limit on long searches)
+        if len(self.corral_results) >= 2**16: self.corral_results.clear()
+        self.corral_results[key] = result
+        return result
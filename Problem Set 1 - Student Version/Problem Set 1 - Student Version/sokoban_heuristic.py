@@ -1,6 +1,7 @@
 from sokoban import SokobanProblem, SokobanState
 from mathutils import Direction, Point, manhattan_distance
-from helpers.utils import NotImplemented
+from typing import Dict, FrozenSet, List
+from collections import deque
 
 # This heuristic returns the distance between the player and the nearest crate as an estimate for the path cost
 # While it is consistent, it does a bad job at estimating the actual cost thus the search will explore a lot of nodes before finding a goal
@@ -9,12 +10,102 @@ def weak_heuristic(problem: SokobanProblem, state: SokobanState):
 
 #TODO: Import any modules and write any functions you want to use
 
+# Returns, for each goal, the least number of pushes needed to bring a crate from every position to the goal
+# (ignoring the other crates and whether the player can reach the crate). A position that is missing from the table of a goal
+# can never be pushed to that goal. The tables only depend on the layout so they are computed once and stored in the cache.
+def get_goal_distances(problem: SokobanProblem) -> List[Dict[Point, int]]:
+    tables = problem.cache().get("goal_distances")
+    if tables is None:
+        walkable = problem.layout.walkable
+        vectors = [direction.to_vector() for direction in Direction]
+        tables = []
+        for goal in sorted(problem.layout.goals, key=lambda point: (point.y, point.x)):
+            # A crate can be pushed from 'previous' to 'position' if the player can stand on the other side of 'previous'
+            distances = {goal: 0}
+            queue = deque([goal])
+            while queue:
+                position = queue.popleft()
+                for vector in vectors:
+                    previous = position - vector
+                    if previous in distances or previous not in walkable or previous - vector not in walkable: continue
+                    distances[previous] = distances[position] + 1
+                    queue.append(previous)
+            tables.append(distances)
+        problem.cache()["goal_distances"] = tables
+    return tables
 
+# Returns whether a crate that is not on a goal can never move again (see sokoban_deadlocks.py).
+# A frozen crate stays frozen in every later state, so giving these states an infinite heuristic keeps it consistent.
+def is_frozen(problem: SokobanProblem, state: SokobanState) -> bool:
+    deadlocks = problem.get_deadlocks()
+    cells = deadlocks.cells
+    crates = cells.encode_positions(state.crates)
+    return any(deadlocks.is_frozen_deadlock(crates, cell) for cell in cells.decode_cells(crates & ~cells.goals))
+
+# Returns the minimum total cost of assigning every row to a different column (the Hungarian algorithm in O(n^2 m)).
+# The matrix must have at most as many rows as columns.
+def min_cost_matching(costs: List[List[float]]) -> float:
+    rows, columns = len(costs), len(costs[0]) if costs else 0
+    inf = float("inf")
+    # u and v are the potentials of the rows and the columns, and match[j] is the row assigned to column j (0 if none)
+    # The rows and columns are numbered from 1 so that 0 can be used as a virtual column
+    u, v = [0] * (rows + 1), [0] * (columns + 1)
+    match = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        column = 0
+        minimum = [inf] * (columns + 1)
+        previous = [0] * (columns + 1)
+        used = [False] * (columns + 1)
+        while match[column] != 0:
+            used[column] = True
+            current_row, delta, next_column = match[column], inf, 0
+            for j in range(1, columns + 1):
+                if used[j]: continue
+                reduced = costs[current_row - 1][j - 1] - u[current_row] - v[j]
+                if reduced < minimum[j]:
+                    minimum[j], previous[j] = reduced, column
+                if minimum[j] < delta:
+                    delta, next_column = minimum[j], j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minimum[j] -= delta
+            column = next_column
+        while column:
+            match[column] = match[previous[column]]
+            column = previous[column]
+    return sum(costs[match[j] - 1][j - 1] for j in range(1, columns + 1) if match[j])
+
+# This heuristic is the minimum total number of pushes needed to bring the crates to the goals,
+# where every crate goes to a different goal (a minimum cost matching between the crates and the goals),
+# and the push distance of a crate to a goal ignores the other crates and the player.
+# It is consistent: a step either only moves the player (the heuristic does not change) or pushes one crate by one cell,
+# which changes the push distance of this crate to every goal (and so the matching cost) by at most 1.
+# If some crate cannot be matched to any reachable goal (e.g. it is in a dead corner) or is frozen, the state is a deadlock and the heuristic is infinite.
+# The matching only depends on the crates, so it is cached by the set of crates: the many steps where the player walks
+# without pushing reuse the value of their parent state, and only the states after a push solve a new matching.
 def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
-    #TODO: ADD YOUR CODE HERE
     #IMPORTANT: DO NOT USE "problem.get_actions" HERE.
     # Calling it here will mess up the tracking of the expanded nodes count
     # which is the number of get_actions calls during the search
-    #NOTE: you can use problem.cache() to get a dictionary in which you can store information that will persist between calls of this function
-    # This could be useful if you want to store the results heavy computations that can be cached and used across multiple calls of this function
-    NotImplemented()
\ No newline at end of file
+    cache = problem.cache()
+    matchings: Dict[FrozenSet[Point], float] = cache.get("matchings")
+    if matchings is None:
+        matchings = cache["matchings"] = {}
+    value = matchings.get(state.crates)
+    if value is None:
+        tables = get_goal_distances(problem)
+        # The unreachable goals get a cost larger than any possible matching so they are only used if there is no other choice
+        unreachable = len(problem.layout.walkable) * len(tables) + 1
+        costs = [[table.get(crate, unreachable) for table in tables] for crate in state.crates]
+        value = min_cost_matching(costs)
+        if value >= unreachable or is_frozen(problem, state): value = float("inf")
+        matchings[state.crates] = value
+    if value == 0: return 0
+    # Before any push, the player must walk next to a crate, which is at least the weak heuristic.
+    # It is still consistent: a step of the player changes it by at most 1 without changing the matching,
+    # and the player is already next to a crate (so it is 0) before pushing it.
+    return value + weak_heuristic(problem, state)
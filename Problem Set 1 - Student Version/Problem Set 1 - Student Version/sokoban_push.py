@@ -0,0 +1,177 @@
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+from collections import deque
+
+from mathutils import Direction
+from problem import Problem, Solution
+from sokoban import SokobanProblem, SokobanState, CompactSokobanProblem, CompactSokobanState, SokobanCells
+from sokoban_deadlocks import SokobanDeadlocks
+from helpers.utils import track_call_count
+
+# This file contains the push-level (macro-move) version of the sokoban problem.
+# In SokobanProblem, every step of the player is a search node, so most of the search tree is the player walking
+# around between the crates. Here, an action is a push: the player walks (through the free cells) behind a crate
+# and pushes it by one cell. Since the walk is not part of the state, the player position is replaced by the region
+# that the player can reach, which is identified by its lowest cell (the normalized player position).
+# All the states where the player stands in the same region are the same state, so the state space is much smaller.
+# The cost of a push is 1, so the searches minimize the number of pushes (not the number of steps).
+# The solutions are expanded back into the steps of the player with get_steps (walking along the shortest paths).
+
+# A push is the index of the cell of the pushed crate and the direction of the push
+SokobanPush = Tuple[int, Direction]
+
+# A push-level state contains the normalized player position (the lowest cell index that the player can reach)
+# and the bitmask of the crate cells. The region reachable by the player is kept to avoid recomputing it
+# but it is not compared since it is determined by the other fields.
+class SokobanPushState:
+    __slots__ = ("cells", "player", "crates", "region", "key")
+
+    def __init__(self, cells: SokobanCells, player: int, crates: int, region: int) -> None:
+        self.cells = cells
+        self.player = player
+        self.crates = crates
+        self.region = region
+        self.key = hash((player, crates))
+
+    def __hash__(self) -> int:
+        return self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SokobanPushState) and self.player == other.player and self.crates == other.crates
+
+    def __str__(self) -> str:
+        return str(self.cells.decode(CompactSokobanState(self.cells, self.player, self.crates, 0)))
+
+class SokobanPushProblem(Problem[SokobanPushState, SokobanPush]):
+    # 'player' is the cell index where the player actually stands in the initial state (needed to expand the solutions into steps)
+    def __init__(self, deadlocks: SokobanDeadlocks, player: int, crates: int, prune_deadlocks: bool = False) -> None:
+        super().__init__()
+        self.deadlocks = deadlocks
+        self.cells = deadlocks.cells
+        self.player = player
+        self.prune_deadlocks = prune_deadlocks
+        self.initial_state = self.create_state(player, crates)
+
+    # Creates the state where the player stands at the given cell
+    def create_state(self, player: int, crates: int) -> SokobanPushState:
+        region = self.deadlocks.reachable(player, crates)
+        return SokobanPushState(self.cells, (region & -region).bit_length() - 1, crates, region)
+
+    def get_initial_state(self) -> SokobanPushState:
+        return self.initial_state
+
+    def is_goal(self, state: SokobanPushState) -> bool:
+        return state.crates == self.cells.goals
+
+    # The possible pushes are the crates that the player can reach from behind and that can move forward.
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanPushState) -> Iterable[SokobanPush]:
+        actions = []
+        crates, region = state.crates, state.region
+        neighbors = self.cells.neighbors
+        for crate in SokobanCells.decode_cells(crates):
+            for direction, table in self.cells.moves:
+                behind = neighbors[direction ^ 2][crate] # The opposite direction (RIGHT <-> LEFT, UP <-> DOWN)
+                if behind < 0 or not region >> behind & 1: continue
+                target = table[crate]
+                if target < 0 or crates >> target & 1: continue
+                # If enabled, skip the pushes that lead to a deadlock
+                if self.prune_deadlocks and self.deadlocks.is_deadlock(crate, crates ^ (1 << crate) ^ (1 << target), target):
+                    continue
+                actions.append((crate, direction))
+        return actions
+
+    def get_successor(self, state: SokobanPushState, action: SokobanPush) -> SokobanPushState:
+        crate, direction = action
+        target = self.cells.neighbors[direction][crate]
+        # After the push, the player stands where the crate was
+        return self.create_state(crate, state.crates ^ (1 << crate) ^ (1 << target))
+
+    def get_cost(self, state: SokobanPushState, action: SokobanPush) -> float:
+        # All pushes have the same cost
+        return 1
+
+    # Expands a list of pushes (starting from the initial state) into the steps of the player
+    def get_steps(self, pushes: List[SokobanPush]) -> List[Direction]:
+        steps = []
+        player, crates = self.player, self.initial_state.crates
+        for crate, direction in pushes:
+            behind = self.cells.neighbors[direction ^ 2][crate]
+            steps.extend(self.get_walk(player, behind, crates))
+            steps.append(Direction(direction))
+            target = self.cells.neighbors[direction][crate]
+            crates ^= (1 << crate) | (1 << target)
+            player = crate
+        return steps
+
+    # Returns the shortest walk (a list of directions) from the start cell to the goal cell without pushing any crate
+    def get_walk(self, start: int, goal: int, crates: int) -> List[Direction]:
+        parents: Dict[int, Tuple[int, Direction]] = {}
+        seen = 1 << start
+        queue = deque([start])
+        while queue and not seen >> goal & 1:
+            cell = queue.popleft()
+            for direction, table in self.cells.moves:
+                next_cell = table[cell]
+                if next_cell < 0 or (seen | crates) >> next_cell & 1: continue
+                seen |= 1 << next_cell
+                parents[next_cell] = (cell, direction)
+                queue.append(next_cell)
+        walk = []
+        cell = goal
+        while cell != start:
+            cell, direction = parents[cell]
+            walk.append(direction)
+        walk.reverse()
+        return walk
+
+    # Creates the push-level problem starting from a state of a SokobanProblem or a CompactSokobanProblem
+    # The cells and the deadlock detection of the layout are shared with the given problem, and the push problems
+    # created from the same problem share their cache (so the tables of the layout are only computed once)
+    @staticmethod
+    def from_problem(problem: Union[SokobanProblem, CompactSokobanProblem], state: Union[SokobanState, CompactSokobanState, None] = None) -> 'SokobanPushProblem':
+        if state is None: state = problem.get_initial_state()
+        deadlocks = problem.get_deadlocks()
+        if isinstance(state, CompactSokobanState):
+            player, crates = state.player, state.crates
+        else:
+            player, crates = deadlocks.cells.indices[state.player], deadlocks.cells.encode_positions(state.crates)
+        push_problem = SokobanPushProblem(deadlocks, player, crates, problem.prune_deadlocks)
+        push_problem._cache = problem.cache().setdefault("push_cache", {})
+        return push_problem
+
+# Returns the push distance from every cell to the nearest goal (ignoring the other crates),
+# which is the least number of pushes needed to bring a crate on that cell to a goal.
+# It is computed once per layout by pulling crates away from the goals, and it is infinite for the dead squares.
+def get_push_distances(problem: SokobanPushProblem) -> List[float]:
+    distances = problem.cache().get("push_distances")
+    if distances is None:
+        neighbors = problem.cells.neighbors
+        distances = [float("inf")] * len(problem.cells.positions)
+        queue = deque(SokobanCells.decode_cells(problem.cells.goals))
+        for goal in queue: distances[goal] = 0
+        while queue:
+            cell = queue.popleft()
+            for table in neighbors:
+                next_cell = table[cell]
+                if next_cell < 0 or table[next_cell] < 0 or distances[next_cell] != float("inf"): continue
+                distances[next_cell] = distances[cell] + 1
+                queue.append(next_cell)
+        problem.cache()["push_distances"] = distances
+    return distances
+
+# This heuristic is the sum of the push distances of the crates to their nearest goals.
+# Every push moves one crate by one cell, so it decreases the heuristic by at most 1 (the cost of a push): it is consistent.
+def push_heuristic(problem: SokobanPushProblem, state: SokobanPushState) -> float:
+    distances = get_push_distances(problem)
+    return sum(distances[crate] for crate in SokobanCells.decode_cells(state.crates))
+
+# Adapts a search function so that it searches over the pushes and returns the steps of the player.
+# The returned function takes a SokobanProblem (or a CompactSokobanProblem) and a state like the other search functions,
+# and any extra argument (e.g. the heuristic, which receives the push-level problem and states) is passed to the search.
+def search_pushes(search_fn: Callable[..., Solution]) -> Callable[..., Solution]:
+    def search(problem: Union[SokobanProblem, CompactSokobanProblem], state, *args) -> Solution:
+        push_problem = SokobanPushProblem.from_problem(problem, state)
+        pushes = search_fn(push_problem, push_problem.get_initial_state(), *args)
+        return None if pushes is None else push_problem.get_steps(pushes)
+    return search
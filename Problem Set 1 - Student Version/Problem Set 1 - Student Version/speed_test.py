@@ -1,9 +1,14 @@
-import time
+from typing import Any, Callable, Dict, Tuple
+import time, statistics
 
-def math_test(steps: int = int(1e7), verbose: bool = False) -> float:
+# Each benchmark runs a short workload and returns the elapsed time in seconds.
+# The benchmarks are repeated several times and the median is used, so a single noisy run does not skew the result.
+
+def math_test(steps: int = int(1e5), verbose: bool = False) -> float:
     # This speed test approximates PI
     # by integrating the arc length of the function sqrt(1 - x^2) over x in [0, 1] to get PI/2
-    start = time.time()
+    # It mostly measures the speed of the interpreter loop and the floating point arithmetic
+    start = time.perf_counter()
 
     arc_length = 0
     x, y = 0, 1
@@ -16,55 +21,163 @@ def math_test(steps: int = int(1e7), verbose: bool = False) -> float:
         x, y = new_x, new_y
     pi = 2 * arc_length
 
-    elapsed = time.time() - start
+    elapsed = time.perf_counter() - start
 
     if verbose: print(f"Math Test: Done in {elapsed} seconds")
-    
+
     return elapsed
 
-def sort_test(size: int = int(1e7), verbose: bool = False) -> float:
+def sort_test(size: int = int(1e5), verbose: bool = False) -> float:
     import random
 
-    start = time.time()
+    start = time.perf_counter()
 
-    random.seed(123)
-    data = [random.randint(0, 1000) for _ in range(size)]
+    rng = random.Random(123)
+    data = [rng.randint(0, 1000) for _ in range(size)]
     data.sort()
 
-    elapsed = time.time() - start
+    elapsed = time.perf_counter() - start
 
     if verbose: print(f"Sort Test: Done in {elapsed} seconds")
-    
+
     return elapsed
 
+def dict_test(size: int = int(1e5), verbose: bool = False) -> float:
+    # This speed test measures the dictionary and set operations (insert, lookup and delete)
+    # which dominate the bookkeeping of the search algorithms (explored sets, parent maps, etc.)
+    start = time.perf_counter()
+
+    table = {}
+    seen = set()
+    for index in range(size):
+        key = (index * 7919) % size
+        table[key] = table.get(key, 0) + 1
+        if key not in seen: seen.add(key)
+    for key in range(size):
+        del table[key]
+
+    elapsed = time.perf_counter() - start
+
+    if verbose: print(f"Dict Test: Done in {elapsed} seconds")
+
+    return elapsed
+
+def allocation_test(size: int = int(1e5), verbose: bool = False) -> float:
+    # This speed test measures the allocation (and deallocation) of small objects such as the states created during search
+    start = time.perf_counter()
+
+    items = []
+    for index in range(size):
+        items.append((index, [index], {"index": index}))
+    items.clear()
+
+    elapsed = time.perf_counter() - start
+
+    if verbose: print(f"Allocation Test: Done in {elapsed} seconds")
+
+    return elapsed
+
+# The benchmarks and the time (in seconds) each of them takes on the grading machine.
+# The math and sort references are scaled down from the original 1e7-step tests (12 and 24 seconds).
+# The dict and allocation references were derived from their speed relative to the math test.
+benchmarks: Dict[str, Callable[..., float]] = {
+    "math": math_test,
+    "sort": sort_test,
+    "dict": dict_test,
+    "allocation": allocation_test,
+}
+reference_times: Dict[str, float] = {
+    "math": 0.12,
+    "sort": 0.24,
+    "dict": 0.23,
+    "allocation": 0.38,
+}
+
 def warm_up():
-    math_test(int(1e5))
-    sort_test(int(1e5))
+    for benchmark in benchmarks.values():
+        benchmark(int(1e4))
 
-math_reference_time = 12
-sort_reference_time = 24
+# Runs every benchmark 'repeats' times and returns the median and the variance of its elapsed time
+def run_benchmarks(repeats: int = 7, verbose: bool = False) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, benchmark in benchmarks.items():
+        samples = [benchmark() for _ in range(repeats)]
+        results[name] = {
+            "median": statistics.median(samples),
+            "variance": statistics.pvariance(samples),
+        }
+        if verbose: print(f"{name.capitalize()} Test: median = {results[name]['median']:.4f} sec, variance = {results[name]['variance']:.2e}")
+    return results
 
-def speed_test() -> float:
-    math_time = math_test(verbose=True)
-    sort_time = sort_test(verbose=True)
-    multiplier = min([math_time / math_reference_time, sort_time / sort_reference_time])
-    return multiplier
+# The multiplier is the median of the slowdowns of all the benchmarks relative to the grading machine,
+# so one benchmark that happens to be unusually fast or slow on this machine does not decide the time limits alone
+def speed_test(repeats: int = 7) -> Tuple[float, Dict[str, Dict[str, float]]]:
+    results = run_benchmarks(repeats, verbose=True)
+    multiplier = statistics.median(results[name]["median"] / reference_times[name] for name in benchmarks)
+    return multiplier, results
+
+# The calibration is only valid for the machine and the python interpreter on which it was measured
+def get_fingerprint() -> Dict[str, Any]:
+    import os, platform
+    return {
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+    }
 
 def get_time_limit_multiplier(overwrite: bool = False):
     import os, json
     file_name = "time_config.json"
+    fingerprint = get_fingerprint()
     if not overwrite and os.path.exists(file_name):
-        return json.load(open(file_name, 'r'))["multiplier"]
-    else:
-        print("Measuring the speed of your machine...")
-        warm_up()
-        multiplier = speed_test()
-        if multiplier < 1:
-            print(f"Your machine is {1.0/multiplier} times faster than the grading machine. Time limits will be decreased accordingly.")
-        elif multiplier > 1:
-            print(f"Your machine is {multiplier} time slower than the grading machine. Time limits will be increased accordingly.")
-        json.dump({'multiplier':multiplier}, open(file_name, 'w'), indent=2)
-        return multiplier
+        config = json.load(open(file_name, 'r'))
+        # Re-calibrate if the file was written on a different machine or python version
+        if config.get("fingerprint") == fingerprint and "multiplier" in config:
+            return config["multiplier"]
+        print("The machine or the python version changed since the last speed measurement.")
+    print("Measuring the speed of your machine...")
+    warm_up()
+    multiplier, results = speed_test()
+    if multiplier < 1:
+        print(f"Your machine is {1.0/multiplier} times faster than the grading machine. Time limits will be decreased accordingly.")
+    elif multiplier > 1:
+        print(f"Your machine is {multiplier} time slower than the grading machine. Time limits will be increased accordingly.")
+    json.dump({'multiplier':multiplier, 'fingerprint':fingerprint, 'benchmarks':results}, open(file_name, 'w'), indent=2)
+    return multiplier
+
+# Measures how long the autograder takes to start and to prepare the testcases of a question (without running them).
+# Each repeat runs in a new python process so that the imports are not already cached, and the median time is returned.
+def startup_test(question: int = 1, repeats: int = 5, verbose: bool = False) -> float:
+    import subprocess, sys
+    script = "\n".join([
+        "import time",
+        "start = time.perf_counter()",
+        "import autograder",
+        "_, problems = autograder.read_problems()",
+        f"problem = autograder.Problem(**problems[{question-1}])",
+        "for test_case in problem.get_test_cases(): problem.decode(test_case)",
+        "print(time.perf_counter() - start)",
+    ])
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.split()[-1]))
+    elapsed = statistics.median(samples)
+
+    if verbose: print(f"Startup Test (Question {question}): median = {elapsed:.4f} sec")
+
+    return elapsed
 
 if __name__ == "__main__":
-    get_time_limit_multiplier(overwrite=True)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure the speed of this machine to calibrate the time limits of the autograder")
+    parser.add_argument("--startup", "-s", type=int, nargs="*", metavar="QUESTION", help="instead of calibrating, measure the startup time of the autograder for the given questions (all of them if none is given)")
+    args = parser.parse_args()
+    if args.startup is None:
+        get_time_limit_multiplier(overwrite=True)
+    else:
+        import json
+        questions = args.startup or range(1, len(json.load(open("testcases/problems.json"))["problems"]) + 1)
+        for question in questions: startup_test(question, verbose=True)
\ No newline at end of file
@@ -1,5 +1,10 @@
-from helpers import test_tools
-from tree import TreeGame
-from dungeon import DungeonGame
-from sudoku import SudokuProblem
-from mathutils import *
\ No newline at end of file
+from .utils import LazyRegistry
+
+# The names that the testcases can use. Each one is only imported when a testcase expression uses it,
+# so grading a single question does not pay for importing the modules of the other questions.
+registry = LazyRegistry({
+    "test_tools": ("helpers.test_tools", None),
+    "TreeGame": ("tree", "TreeGame"),
+    "DungeonGame": ("dungeon", "DungeonGame"),
+    "SudokuProblem": ("sudoku", "SudokuProblem"),
+}, star_modules=["mathutils"])
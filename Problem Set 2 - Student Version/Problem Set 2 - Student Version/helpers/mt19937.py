@@ -1,47 +1,131 @@
 # This is a Pseudo Random Number Generator using the Mersene Twister Algorithm
+from typing import Any, List, Optional
+
+# NumPy is optional. If it is installed, its MT19937 bit generator is used to produce the numbers in blocks,
+# otherwise the same numbers are produced by the pure-python implementation below.
+# It is imported when the first generator is created, so importing this module stays cheap.
+_numpy: Any = None
+
+def _import_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
 class RandomGenerator:
     __N = 624
 
-    def __init__(self, seed: int = None) -> None:
+    # If use_numpy is None, NumPy is used if it is installed. Both implementations generate the exact same numbers
+    def __init__(self, seed: Optional[int] = None, use_numpy: Optional[bool] = None) -> None:
+        numpy = None if use_numpy is False else _import_numpy()
+        if use_numpy and numpy is None: raise ImportError("NumPy is not installed")
+        self.__bit_generator = None if numpy is None else numpy.random.MT19937(0)
         self.table = [0] * RandomGenerator.__N
-        self.index = RandomGenerator.__N+1
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None):
         if seed is None:
             import time
             seed = time.time_ns()
-        self.seed(seed)
-
-    def seed(self, seed: int):
-        self.table[0] = seed
+        # The buffer holds the numbers generated by the last twist of the table, and the index points to the next number to return
+        self.buffer: List[int] = []
+        self.index = 0
+        # For 32-bit seeds, NumPy initializes the table (exactly like the loop below) in C
+        if self.__bit_generator is not None and 0 <= seed <= 0xffffffff and hasattr(self.__bit_generator, "_legacy_seeding"):
+            self.__bit_generator._legacy_seeding(seed)
+            return
+        # Only the highest bit of the first entry is used by the twist, so it can be truncated to 32 bits like the other entries
+        self.table[0] = seed & 0xffffffff
+        previous = seed
         for i in range(1, RandomGenerator.__N):
-            temp = 1812433253 * (self.table[i-1] ^ (self.table[i-1] >> 30)) + i
-            self.table[i] = temp & 0xffffffff
+            previous = (1812433253 * (previous ^ (previous >> 30)) + i) & 0xffffffff
+            self.table[i] = previous
+        if self.__bit_generator is not None:
+            # Starting at the end of the table forces a twist before the first number is generated
+            self.__bit_generator.state = {
+                "bit_generator": "MT19937",
+                "state": {"key": _numpy.array(self.table, dtype=_numpy.uint32), "pos": RandomGenerator.__N},
+            }
 
     def __twist(self):
-        for i in range(0, RandomGenerator.__N):
-            x = (self.table[i] & 0x80000000) + (self.table[(i+1) % RandomGenerator.__N] & 0x7FFFFFFF)
-            xA = x >> 1
-            if (x % 2) != 0:
-                xA = xA ^ 0x9908B0DF
-            self.table[i] = self.table[(i + 397) % RandomGenerator.__N] ^ xA
+        table = self.table
+        N, M = RandomGenerator.__N, 397
+        # The loop is split to avoid computing the indices modulo N
+        for i in range(0, N - M):
+            x = (table[i] & 0x80000000) | (table[i+1] & 0x7FFFFFFF)
+            table[i] = table[i + M] ^ (x >> 1) ^ (0x9908B0DF if x & 1 else 0)
+        for i in range(N - M, N - 1):
+            x = (table[i] & 0x80000000) | (table[i+1] & 0x7FFFFFFF)
+            table[i] = table[i + M - N] ^ (x >> 1) ^ (0x9908B0DF if x & 1 else 0)
+        x = (table[N-1] & 0x80000000) | (table[0] & 0x7FFFFFFF)
+        table[N-1] = table[M-1] ^ (x >> 1) ^ (0x9908B0DF if x & 1 else 0)
 
-    def generate(self) -> int:
-        if self.index >= RandomGenerator.__N:
+    # Returns the next 'blocks' tables of numbers (624 numbers per block) as a list
+    def __generate_blocks(self, blocks: int) -> List[int]:
+        if self.__bit_generator is not None:
+            return self.__bit_generator.random_raw(blocks * RandomGenerator.__N).tolist()
+        numbers = []
+        for _ in range(blocks):
             self.__twist()
+            for y in self.table:
+                y ^= y >> 11
+                y ^= (y << 7) & 0x9D2C5680
+                y ^= (y << 15) & 0xEFC60000
+                y ^= y >> 18
+                numbers.append(y)
+        return numbers
+
+    def generate(self) -> int:
+        if self.index >= len(self.buffer):
+            self.buffer = self.__generate_blocks(1)
             self.index = 0
+        y = self.buffer[self.index]
+        self.index += 1
+        return y
 
-        y = self.table[self.index]
-        y = y ^ ((y >> 11) & 0xFFFFFFFF)
-        y = y ^ ((y << 7) & 0x9D2C5680)
-        y = y ^ ((y << 15) & 0xEFC60000)
-        y = y ^ (y >> 18)
+    # Returns the same numbers as calling 'generate' n times
+    def generate_many(self, n: int) -> List[int]:
+        numbers = self.buffer[self.index:self.index + n]
+        self.index += len(numbers)
+        remaining = n - len(numbers)
+        if remaining > 0:
+            N = RandomGenerator.__N
+            blocks = (remaining + N - 1) // N
+            generated = self.__generate_blocks(blocks)
+            numbers += generated[:remaining]
+            # The unused numbers of the last block are kept for the next calls
+            self.buffer = generated[(blocks - 1) * N:]
+            self.index = remaining - (blocks - 1) * N
+        return numbers
 
-        self.index += 1
-        return y & 0xffffffff
-    
     def int(self, l: int, u: int) -> int:
         assert l <= u, f"the lower bound must be less then or equal the upper bound, got {l=} nd {u=}"
         if l == u: return l
         return l + self.generate() % (u - l + 1)
 
+    # Returns the same numbers as calling 'int(l, u)' n times
+    def ints(self, l: int, u: int, n: int) -> List[int]:
+        assert l <= u, f"the lower bound must be less then or equal the upper bound, got {l=} nd {u=}"
+        if l == u: return [l] * n
+        numbers = self.generate_many(n)
+        size = u - l + 1
+        # NumPy is only used if every intermediate value fits in a 64-bit integer
+        if self.__bit_generator is not None and size < 2**32 and -2**62 < l < 2**62:
+            return (l + _numpy.array(numbers, dtype=_numpy.int64) % size).tolist()
+        return [l + number % size for number in numbers]
+
     def float(self, l: float = 0, u: float = 1) -> float:
-        return (self.generate() / 0xffffffff) * (u - l) + l
\ No newline at end of file
+        return (self.generate() / 0xffffffff) * (u - l) + l
+
+    # Returns the same numbers as calling 'float(l, u)' n times
+    def floats(self, n: int, l: float = 0, u: float = 1) -> List[float]:
+        numbers = self.generate_many(n)
+        scale = float(u - l)
+        if self.__bit_generator is not None:
+            # The operations are done in the same order as in `float` so that the results are identical
+            return ((_numpy.array(numbers, dtype=_numpy.float64) / 0xffffffff) * scale + l).tolist()
+        return [(number / 0xffffffff) * scale + l for number in numbers]
@@ -0,0 +1,227 @@
+from typing import Any, Callable, Deque, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import Connection, wait
+import multiprocessing, signal, threading, time, traceback
+
+try:
+    import resource
+except ImportError: # The resource module is only available on POSIX systems
+    resource = None
+
+# The sandbox runs the testcases in a pool of warm worker processes.
+# Unlike a thread, a worker process can always be stopped: if a task exceeds its time limit,
+# the worker is killed (even if it is stuck inside C code such as a huge sort) and a fresh worker takes its place.
+
+# This exception is set on the future of a task whose worker exceeded the wall-clock or the CPU time limit
+class TimeLimitExceeded(Exception):
+    pass
+
+# This exception is set on the future of a task whose worker died before returning a result
+class WorkerCrashed(Exception):
+    pass
+
+# The message sent by a new worker to notify the pool that it is initialized and ready to run tasks
+_READY = "ready"
+# The message sent by a worker to notify the pool that the timed part of the task has started
+_STARTED = "started"
+
+# The connection of the current process to the pool (None if we are not inside a worker)
+_worker_connection: Optional[Connection] = None
+# The CPU time limit of the task currently running in this worker
+_worker_cpu_limit: Optional[float] = None
+
+def _set_cpu_limit(limit: Optional[float]):
+    if resource is None: return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if limit is None:
+        soft = hard
+    else:
+        # RLIMIT_CPU counts the whole lifetime of the process, so the limit is added to the time already used
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + limit) + 1
+        if hard != resource.RLIM_INFINITY: soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+# Starts the time limit of the current task. Everything done by the task before this call
+# (e.g. loading the testcase inputs) is not counted in the time limit of the task.
+# Outside a worker, this function does nothing.
+def start_time_limit():
+    if _worker_connection is None: return
+    _set_cpu_limit(_worker_cpu_limit)
+    _worker_connection.send(_STARTED)
+
+def _worker_main(connection: Connection, initializer: Optional[Callable], initargs: Tuple):
+    global _worker_connection, _worker_cpu_limit
+    # Interrupts are handled by the parent process which will shut the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None: initializer(*initargs)
+    _worker_connection = connection
+    connection.send(_READY)
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None: break
+        fn, args, _worker_cpu_limit = task
+        try:
+            outcome = (True, fn(*args))
+        except BaseException as err:
+            outcome = (False, err)
+        _set_cpu_limit(None)
+        try:
+            connection.send(outcome)
+        except Exception:
+            # The output or the exception could not be pickled, so we send the traceback instead
+            connection.send((False, RuntimeError(traceback.format_exc())))
+
+class _Task:
+    __slots__ = ("fn", "args", "timeout", "future")
+
+    def __init__(self, fn: Callable, args: Tuple, timeout: Optional[float]) -> None:
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.future = Future()
+
+class _Worker:
+    __slots__ = ("process", "connection", "task", "deadline", "ready")
+
+    def __init__(self, process: multiprocessing.Process, connection: Connection) -> None:
+        self.process = process
+        self.connection = connection
+        self.task: Optional[_Task] = None
+        self.deadline: Optional[float] = None
+        # False until the worker sends _READY (the start-up and the initializer are not counted in the time limit)
+        self.ready = False
+
+# A pool of pre-spawned worker processes which are reused between tasks.
+# Each task is given a wall-clock and a CPU time limit; if any of them is exceeded, the worker is killed
+# and replaced by a new one, so a runaway task cannot slow down the tasks that come after it.
+class SandboxPool:
+    def __init__(self, workers: int = 1, initializer: Optional[Callable] = None, initargs: Tuple = ()) -> None:
+        self.initializer = initializer
+        self.initargs = initargs
+        self._context = multiprocessing.get_context()
+        self._tasks: Deque[_Task] = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        # The dispatcher thread is woken up through this pipe whenever a task is submitted
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._workers: List[_Worker] = [self._spawn() for _ in range(max(1, workers))]
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _spawn(self) -> _Worker:
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_connection, self.initializer, self.initargs), daemon=True)
+        process.start()
+        child_connection.close()
+        return _Worker(process, parent_connection)
+
+    def _replace(self, worker: _Worker):
+        worker.process.kill()
+        worker.process.join()
+        worker.task = worker.deadline = None
+        with self._lock:
+            # No need for a new worker if the pool is shutting down and there are no more tasks to run
+            if self._closed and not self._tasks: return
+            worker.connection.close()
+            self._workers[self._workers.index(worker)] = self._spawn()
+
+    # Submit a task to run 'fn(*args)' in a worker. The returned future will contain the returned value of 'fn',
+    # the exception it raised, TimeLimitExceeded if it ran out of time or WorkerCrashed if the worker died.
+    # The timeout is measured from the call to 'start_time_limit' in the worker, or from the start of the task
+    # if the task did not call it yet. If the timeout is None, the task is not time-limited.
+    def submit(self, fn: Callable, *args: Any, timeout: Optional[float] = None) -> Future:
+        task = _Task(fn, args, timeout)
+        with self._lock:
+            if self._closed: raise RuntimeError("Cannot submit a task to a pool after it is shut down")
+            self._tasks.append(task)
+        self._wakeup_writer.send(None)
+        return task.future
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                for worker in self._workers:
+                    while worker.task is None and self._tasks:
+                        task = self._tasks.popleft()
+                        if not task.future.set_running_or_notify_cancel(): continue
+                        worker.task = task
+                        # If the worker is still starting up, the deadline is set when it becomes ready
+                        worker.deadline = None if task.timeout is None or not worker.ready else time.perf_counter() + task.timeout
+                        try:
+                            worker.connection.send((task.fn, task.args, task.timeout))
+                        except OSError:
+                            pass # The worker died, so the task will fail with WorkerCrashed
+                busy = [worker for worker in self._workers if worker.task is not None]
+                if self._closed and not busy and not self._tasks: break
+            deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+            wait_time = max(0, min(deadlines) - time.perf_counter()) if deadlines else None
+            waitables = [self._wakeup_reader]
+            for worker in busy: waitables += [worker.connection, worker.process.sentinel]
+            ready = wait(waitables, wait_time)
+            while self._wakeup_reader.poll(): self._wakeup_reader.recv()
+            now = time.perf_counter()
+            for worker in busy:
+                task = worker.task
+                if worker.connection in ready:
+                    try:
+                        message = worker.connection.recv()
+                    except (EOFError, OSError):
+                        message = None
+                    if message == _READY:
+                        worker.ready = True
+                        worker.deadline = None if task.timeout is None else now + task.timeout
+                        continue
+                    if message == _STARTED:
+                        worker.deadline = None if task.timeout is None else now + task.timeout
+                        continue
+                    if message is not None:
+                        worker.task = worker.deadline = None
+                        success, value = message
+                        if success:
+                            task.future.set_result(value)
+                        else:
+                            task.future.set_exception(value)
+                        continue
+                if not worker.process.is_alive():
+                    worker.process.join()
+                    exitcode = worker.process.exitcode
+                    if hasattr(signal, "SIGXCPU") and exitcode == -signal.SIGXCPU:
+                        task.future.set_exception(TimeLimitExceeded("CPU time limit exceeded"))
+                    else:
+                        task.future.set_exception(WorkerCrashed(f"The worker exited with code {exitcode}"))
+                    self._replace(worker)
+                elif worker.deadline is not None and now >= worker.deadline:
+                    task.future.set_exception(TimeLimitExceeded("Wall-clock time limit exceeded"))
+                    self._replace(worker)
+
+    # Stop accepting tasks and stop the workers.
+    # If 'cancel' is True, the pending tasks are cancelled and the running tasks are killed
+    def shutdown(self, cancel: bool = False):
+        with self._lock:
+            self._closed = True
+            if cancel:
+                while self._tasks: self._tasks.popleft().future.cancel()
+                for worker in self._workers:
+                    if worker.task is not None:
+                        worker.process.kill()
+        self._wakeup_writer.send(None)
+        self._dispatcher.join()
+        for worker in self._workers:
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+            worker.process.join(1)
+            if worker.process.is_alive(): worker.process.kill()
+            worker.connection.close()
+
+    def __enter__(self) -> 'SandboxPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown(cancel=exc_type is not None)
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+import csv, json, os, sys, time, tracemalloc
+
+from .utils import get_call_counts
+
+try:
+    import resource
+except ImportError: # The resource module is only available on POSIX systems
+    resource = None
+
+# The telemetry records how the solution performed in each test: its wall-clock time, its CPU time,
+# its peak memory and how many times each instrumented function was called (e.g. the number of expanded nodes)
+
+# On Linux, the peak resident set size (VmHWM) of the process can be reset, so it can be measured per test
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+# Returns the peak resident set size of the process in KiB (or None if it cannot be measured)
+def _get_peak_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+# Measures the code running inside the "with" block and stores the measurements in the yielded dictionary
+# The peak memory allocated by python is only measured if tracemalloc is tracing (see '--trace-memory' in the autograder)
+@contextmanager
+def measure_performance() -> Iterator[Dict[str, Any]]:
+    metrics: Dict[str, Any] = {}
+    calls_before = get_call_counts()
+    _reset_peak_rss()
+    if tracemalloc.is_tracing(): tracemalloc.reset_peak()
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield metrics
+    finally:
+        metrics["wall_time"] = time.perf_counter() - start_wall
+        metrics["cpu_time"] = time.thread_time() - start_cpu
+        metrics["peak_rss_kb"] = _get_peak_rss()
+        if tracemalloc.is_tracing():
+            metrics["peak_traced_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        calls_after = get_call_counts()
+        metrics["calls"] = {
+            name: count - calls_before.get(name, 0)
+            for name, count in calls_after.items() if count != calls_before.get(name, 0)
+        }
+
+# Writes the telemetry records to a json file or, if the path ends with ".csv", to a csv file
+# In the csv file, the call counts are flattened into columns named "calls.<function name>"
+def write_report(path: str, records: List[Dict[str, Any]]):
+    if os.path.splitext(path)[1].lower() == ".csv":
+        rows = []
+        for record in records:
+            row = {key: value for key, value in record.items() if key != "calls"}
+            row.update((f"calls.{name}", count) for name, count in record.get("calls", {}).items())
+            rows.append(row)
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=2)
@@ -360,7 +360,7 @@ def run_search_for_tree(
     value, action = search_fn(game, initial_state, tree_heuristic, -1)
     
     # get a list of nodes that have been explored by the search function
-    explored = [call["args"][1] for call in fetch_recorded_calls(TreeGame.is_terminal)]
+    explored = [args[1] for args, _ in fetch_recorded_calls(TreeGame.is_terminal)]
     
     return value, action, [node.name for node in explored]
 
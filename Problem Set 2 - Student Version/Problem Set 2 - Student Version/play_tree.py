@@ -90,7 +90,7 @@ def main(args: argparse.Namespace):
         
         # Retrieve the traversed nodes, if the current agent is a search agent
         if isinstance(agent, SearchAgent):
-            explored_nodes = [call["args"][1].name for call in list(fetch_recorded_calls(TreeGame.is_terminal))]
+            explored_nodes = [args[1].name for args, _ in fetch_recorded_calls(TreeGame.is_terminal)]
             print(f"The agent explored {len(explored_nodes)} Node(s): {', '.join(explored_nodes)}")
             # if drawing the pruned tree is requested and the search function uses alpha beta pruning
             # draw the pruned tree
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from game import Game
 import json
 
-from helpers.utils import record_calls
+from helpers.utils import memoize_by_file, record_calls
 
 # Some helper constants and functions to draw the tree node
 BRANCH_DOWN = "\u252c\u2500"
@@ -52,7 +52,9 @@ class TreeNode:
         return '\n'.join(self.__recursive_str(True))
     
     # read a tree from a file
+    # The tree is memoized by path (until the file is modified) since it is never modified after loading
     @staticmethod
+    @memoize_by_file
     def from_file(path: str) -> 'TreeNode':
         problem_def: Dict = json.load(open(path, 'r'))
         def convert(tree: Union[float, Dict[str, Any]], name: str) -> TreeNode:
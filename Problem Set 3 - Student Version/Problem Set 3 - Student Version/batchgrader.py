@@ -1,27 +1,73 @@
-import os, subprocess, argparse
-from posixpath import dirname
+import os, sys, argparse, json
+from typing import Dict, List, TextIO
+from concurrent.futures import Future, as_completed
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("path")
-    parser.add_argument("out")
-    parser.add_argument("--repeat", "-r", type=int, default=4)
-    args = parser.parse_args()
+from autograder import Problem, read_problems, collect_result, execute_test_case
+from helpers.sandbox import SandboxPool
+
+# The output of the student solutions would flood the console, so the workers discard it
+def silence_output():
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
 
+# Write the grades of a student as soon as all of its runs are done, so that the results can be read while the grading is running
+def write_result(file: TextIO, file_format: str, dirname: str, grades: List[float], maximum_grade: float):
+    if file_format == "jsonl":
+        file.write(json.dumps({"student": dirname, "grades": grades, "maximum_grade": maximum_grade}) + "\n")
+    else:
+        file.write(f"{dirname}, {', '.join(f'{grade:g}' for grade in grades)}\n")
+    file.flush()
+
+def main(args: argparse.Namespace):
     path: str = args.path
     out: str = args.out
     repeat: int = args.repeat
-    
-    dirnames = [dirname for dirname in os.listdir(path) if os.path.isdir(os.path.join(path, dirname))]    
-    results = {dirname:[] for dirname in dirnames}
+    file_format: str = args.format or ("jsonl" if out.endswith(".jsonl") else "csv")
+    # The time limits are measured in wall-clock time, so we never run more jobs than there are cores
+    jobs: int = min(args.jobs if args.jobs > 0 else os.cpu_count(), os.cpu_count())
+
+    dirnames = [dirname for dirname in os.listdir(path) if os.path.isdir(os.path.join(path, dirname))]
 
-    for r in range(1, repeat+1):
-        for index, dirname in enumerate(dirnames):
+    # The testcases are loaded once and shared by all the students and runs
+    _, problems = read_problems()
+    problems = [Problem(**problem) for problem in problems]
+    test_cases = [(problem, test_case) for problem in problems for test_case in problem.get_test_cases()]
+    maximum_grade = sum(problem.get_maximum_grade(test_case) for problem, test_case in test_cases)
+
+    with SandboxPool(jobs, initializer=silence_output) as pool, open(out, 'w') as file:
+        # Each student run is a list of futures (one per testcase) which will be summed once they are all done
+        pending: Dict[Future, str] = {}
+        runs: Dict[str, List[List[Future]]] = {}
+        for dirname in dirnames:
             dirpath = os.path.join(path, dirname)
-            print(f"Run #{r}/{repeat}: Grading Student {index+1}/{len(dirnames)} - {dirname}")
-            result = subprocess.call(["python", "autograder.py", "-t", "1", "-s", dirpath], stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-            results[dirname].append(result)
-            print(f"Result:", result)
-    
-    with open(out, 'w') as f:
-        f.writelines([f"{k}, {', '.join(str(v) for v in vs)}\n" for k, vs in results.items()])
\ No newline at end of file
+            runs[dirname] = []
+            for run in range(repeat):
+                # Each run executes the solution modules again, so it does not start from the state left by the previous runs
+                futures = [
+                    pool.submit(execute_test_case, problem.kwargs, test_case, dirpath, (dirname, run), timeout=problem.get_timeout(test_case))
+                    for problem, test_case in test_cases
+                ]
+                runs[dirname].append(futures)
+                pending.update((future, dirname) for future in futures)
+        remaining = {dirname: repeat * len(test_cases) for dirname in dirnames}
+        graded = 0
+        for future in as_completed(pending):
+            dirname = pending[future]
+            remaining[dirname] -= 1
+            if remaining[dirname] != 0: continue
+            grades = [
+                sum(problem.get_grade(test_case, collect_result(future)) for (problem, test_case), future in zip(test_cases, futures))
+                for futures in runs[dirname]
+            ]
+            graded += 1
+            print(f"Graded Student {graded}/{len(dirnames)} - {dirname}: {', '.join(f'{grade:g}' for grade in grades)} / {maximum_grade:g}")
+            write_result(file, file_format, dirname, grades, maximum_grade)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("out")
+    parser.add_argument("--repeat", "-r", type=int, default=4)
+    parser.add_argument("--jobs", "-j", type=int, default=0, help="the number of worker processes (0 to use all the cores). It is capped by the number of cores")
+    parser.add_argument("--format", "-f", choices=["csv", "jsonl"], default=None, help="the output format (by default, it is deduced from the output file extension)")
+    args = parser.parse_args()
+    main(args)
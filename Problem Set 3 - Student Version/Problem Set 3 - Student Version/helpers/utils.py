@@ -1,8 +1,9 @@
 import os, sys
-from typing import Any, Callable, Dict, List
-from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from types import CodeType, ModuleType
+from dataclasses import dataclass, field
 from collections import deque
-import importlib
+import builtins, dis, importlib, functools, hashlib
 from importlib import util as ilu
 import traceback
 
@@ -12,14 +13,63 @@ def set_solution_path(path: str):
     global solution_path
     solution_path = path
 
+# The modules executed from the solution path, by the absolute path of their file.
+# Each entry is (modification time, size, hash of the source, module).
+_module_cache: Dict[str, Tuple[int, int, bytes, ModuleType]] = {}
+
+# Loads the module from its file in the solution path and registers it in sys.modules under its name.
+# The executed module is reused as long as its file is not modified. If the modification time or the size changed
+# (e.g. the file was touched or copied) but the source is the same, the module is still reused.
+def load_solution_module(name: str) -> ModuleType:
+    file_path = os.path.abspath(os.path.join(solution_path, name.replace(".", os.sep) + ".py"))
+    stat = os.stat(file_path)
+    entry = _module_cache.get(file_path)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        _, _, digest, module = entry
+    else:
+        with open(file_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).digest()
+        if entry is not None and entry[2] == digest:
+            module = entry[3]
+        else:
+            spec = ilu.spec_from_file_location(name, file_path)
+            module = ilu.module_from_spec(spec)
+            sys.modules[name] = module
+            try:
+                spec.loader.exec_module(module)
+            except:
+                # A module that failed to execute is not cached, so the error is raised again the next time it is loaded
+                _module_cache.pop(file_path, None)
+                raise
+        _module_cache[file_path] = (stat.st_mtime_ns, stat.st_size, digest, module)
+    sys.modules[name] = module
+    return module
+
+# Discards the cached solution modules so that they are executed again the next time they are loaded.
+# If a name is given, only the module with that name is discarded (from every solution path).
+def invalidate_module_cache(name: Optional[str] = None):
+    for file_path, (*_, module) in list(_module_cache.items()):
+        if name is None or module.__name__ == name:
+            del _module_cache[file_path]
+            if sys.modules.get(module.__name__) is module: del sys.modules[module.__name__]
+
+# Executes the given solution modules ahead of time, so that the tests do not pay for it.
+# The modules that are not found in the solution path are skipped, and the errors are left for the tests to report.
+# Each sandbox worker preloads the modules when it starts, so the modules are loaded by all the workers in parallel.
+def preload_solution_modules(names: Iterable[str]):
+    if not solution_path: return
+    for name in names:
+        if not os.path.exists(os.path.join(solution_path, name.replace(".", os.sep) + ".py")): continue
+        try:
+            load_solution_module(name)
+        except Exception:
+            pass
+
 def load_function(name: str, use_local: bool = False) -> Callable:
     try:
         path, function = name.rsplit(".", 1)
         if solution_path and not use_local:
-            spec = ilu.spec_from_file_location(path, os.path.join(solution_path, path + ".py"))
-            module = ilu.module_from_spec(spec)
-            sys.modules[path] = module
-            spec.loader.exec_module(module)
+            module = load_solution_module(path)
         else:
             module = importlib.import_module(path)
         return getattr(module, function)
@@ -28,11 +78,53 @@ def load_function(name: str, use_local: bool = False) -> Callable:
         print(traceback.format_exc())
         return lambda *_: NotImplemented()
 
+# Returns the names of the global variables read by the code (including the code of its lambdas and comprehensions)
+def get_global_names(code: CodeType) -> Set[str]:
+    names = {
+        instruction.argval for instruction in dis.get_instructions(code)
+        if instruction.opname in ("LOAD_NAME", "LOAD_GLOBAL")
+    }
+    for constant in code.co_consts:
+        if isinstance(constant, CodeType): names |= get_global_names(constant)
+    return names
+
+# A registry of the names that the testcase expressions can use, which imports each of them only when it is first used.
+# 'names' maps each name to the module that defines it and the attribute to read from the module (None for the module itself).
+# The names that are not in 'names' are looked up in the 'star_modules' as if they were imported with "from module import *".
+class LazyRegistry:
+    def __init__(self, names: Dict[str, Tuple[str, Optional[str]]], star_modules: Iterable[str] = ()) -> None:
+        self.names = names
+        self.star_modules = list(star_modules)
+        self.star_imported = False
+
+    def load(self, name: str) -> Any:
+        module_name, attribute = self.names[name]
+        module = importlib.import_module(module_name)
+        return module if attribute is None else getattr(module, attribute)
+
+    # Adds the public names of the star modules to the namespace (without overwriting the names it already has)
+    def import_star_modules(self, namespace: Dict[str, Any]):
+        self.star_imported = True
+        for module_name in self.star_modules:
+            module = importlib.import_module(module_name)
+            public = getattr(module, "__all__", None) or [name for name in vars(module) if not name.startswith("_")]
+            for name in public: namespace.setdefault(name, getattr(module, name))
+
+    # Adds the names read by the code to the namespace in which it will be evaluated
+    def resolve(self, code: CodeType, namespace: Dict[str, Any]):
+        for name in get_global_names(code):
+            if name in namespace or hasattr(builtins, name): continue
+            if name in self.names:
+                namespace[name] = self.load(name)
+            elif not self.star_imported:
+                self.import_star_modules(namespace)
+
 @dataclass
 class Result:
     success:     bool
     grade:       int
     message:     str
+    metrics:     Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
 class Arguments:
@@ -42,32 +134,70 @@ class Arguments:
 def NotImplemented():
     raise NotImplementedError()
 
+# The instrumentation mode is read from the environment variable AUTOGRADER_INSTRUMENTATION when this module is imported:
+#   "full" (default): track_call_count counts the calls and record_calls records their arguments.
+#   "count": record_calls only counts the calls (the autograder cannot check the traversal order in this mode).
+#   "off": the decorators return the functions unchanged, so the instrumentation costs nothing (for production runs).
+INSTRUMENTATION = os.environ.get("AUTOGRADER_INSTRUMENTATION", "full").strip().lower()
+
+# The functions decorated with track_call_count or record_calls (by qualified name)
+instrumented_functions: Dict[str, Callable] = {}
+
+# The calls are counted in a one-element list stored on the wrapper as 'call_count' (never reset).
+# Updating a list item from the closure is cheaper than updating an attribute of the wrapper.
 def track_call_count(fn):
+    if INSTRUMENTATION == "off": return fn
+    call_count = [0]
+    @functools.wraps(fn)
     def deco(*args, **kwargs):
-        deco.calls += 1
+        call_count[0] += 1
         return fn(*args, **kwargs)
-    deco.calls = 0
+    deco.call_count = call_count
+    deco.fetched = 0 # The number of calls that were already returned by fetch_tracked_call_count
+    instrumented_functions[fn.__qualname__] = deco
     return deco
 
-def fetch_tracked_call_count(fn):
-    calls = getattr(fn, "calls", 0)
-    setattr(fn, "calls", 0)
+# Returns the number of calls since the last fetch
+def fetch_tracked_call_count(fn) -> int:
+    call_count = getattr(fn, "call_count", None)
+    if call_count is None: return 0
+    total = call_count[0]
+    calls, fn.fetched = total - fn.fetched, total
     return calls
 
-def record_calls(fn):
+# Records the arguments of every call as a tuple (args, kwargs).
+# If maxlen is given, the calls are recorded in a ring buffer that only keeps the last 'maxlen' calls,
+# which bounds the memory used by long searches (the calls are still all counted).
+# It can be used as '@record_calls' or '@record_calls(maxlen=...)'.
+def record_calls(fn=None, *, maxlen: Optional[int] = None):
+    if fn is None: return functools.partial(record_calls, maxlen=maxlen)
+    if INSTRUMENTATION == "off": return fn
+    if INSTRUMENTATION == "count": return track_call_count(fn)
+    call_count = [0]
+    calls = deque(maxlen=maxlen)
+    append = calls.append
+    @functools.wraps(fn)
     def deco(*args, **kwargs):
-        deco.calls.append({
-            "args": args,
-            "kwargs": kwargs
-        })
+        call_count[0] += 1
+        append((args, kwargs))
         return fn(*args, **kwargs)
-    deco.calls = deque()
+    deco.call_count = call_count
+    deco.calls = calls
+    deco.fetched = 0
+    instrumented_functions[fn.__qualname__] = deco
     return deco
 
-def fetch_recorded_calls(fn):
-    calls = getattr(fn, "calls", deque())
-    setattr(fn, "calls", deque())
-    return calls
+# Returns the calls recorded since the last fetch as a deque of (args, kwargs) tuples
+def fetch_recorded_calls(fn) -> Deque[Tuple[Tuple[Any, ...], Dict[str, Any]]]:
+    recorded = getattr(fn, "calls", None)
+    if recorded is None: return deque()
+    fn.fetched = fn.call_count[0]
+    # The calls are popped one by one (instead of copying then clearing the buffer) so that no call is lost if another thread is recording
+    return deque(recorded.popleft() for _ in range(len(recorded)))
+
+# Returns the total number of calls (including the fetched ones) to every instrumented function
+def get_call_counts() -> Dict[str, int]:
+    return {name: fn.call_count[0] for name, fn in instrumented_functions.items()}
 
 def add_call_listener(listener):
     def decorator(fn):
@@ -78,6 +208,26 @@ def add_call_listener(listener):
         return decorated
     return decorator
 
+# Memoizes a function that loads an object from a file (given as the first argument), so that
+# loading the same file again returns the same object instead of reading and parsing the file again.
+# The cached object is discarded once the file is modified (the file modification time changes).
+# Since the object is shared, only use it for objects that are not modified after they are loaded.
+# If the object is a CacheContainer, its cache is cleared before returning it so that no data leaks between its users.
+def memoize_by_file(loader):
+    memo: Dict[Any, Any] = {}
+    @functools.wraps(loader)
+    def deco(path: str, *args, **kwargs):
+        key = (os.path.abspath(path), args, tuple(sorted(kwargs.items())))
+        mtime = os.stat(path).st_mtime_ns
+        entry = memo.get(key)
+        if entry is None or entry[0] != mtime:
+            entry = memo[key] = (mtime, loader(path, *args, **kwargs))
+        elif isinstance(entry[1], CacheContainer):
+            entry[1].cache().clear()
+        return entry[1]
+    deco.cache_clear = memo.clear
+    return deco
+
 class CacheContainer:
     def cache(self) -> Dict[Any, Any]:
         if hasattr(self, "_cache"):